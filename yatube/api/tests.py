@@ -0,0 +1,114 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author,
+                text=f'Пост {number}',
+                group=cls.group if number % 2 else None,
+            )
+            for number in range(5)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+
+    def test_posts_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest.get(
+                reverse('api:posts'), {'fields': 'id,text'})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(results[0], {
+            'id': self.posts[-1].pk, 'text': 'Пост 4'})
+        sql = queries.captured_queries[-1]['sql']
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('"image"', sql)
+
+    def test_posts_all_fields(self):
+        response = self.guest.get(reverse('api:posts'), {'group': 'group'})
+        results = response.json()['results']
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0]['author'], 'author')
+        self.assertEqual(results[0]['group'], 'group')
+        self.assertIsNone(results[0]['image'])
+
+    def test_unknown_field(self):
+        response = self.guest.get(reverse('api:posts'), {'fields': 'secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.json()['error'])
+
+    def test_cursor_pagination(self):
+        seen = []
+        params = {'fields': 'id', 'limit': 2}
+        while True:
+            data = self.guest.get(reverse('api:posts'), params).json()
+            seen += [row['id'] for row in data['results']]
+            if not data['next_cursor']:
+                break
+            params['cursor'] = data['next_cursor']
+        self.assertEqual(seen, [post.pk for post in reversed(self.posts)])
+
+    def test_batch(self):
+        ids = [self.posts[2].pk, 0, self.posts[0].pk]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest.get(reverse('api:posts_batch'), {
+                'ids': ','.join(map(str, ids)), 'fields': 'text'})
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response.json(), {
+            'results': [{'text': 'Пост 2'}, {'text': 'Пост 0'}],
+            'missing': [0],
+        })
+        response = self.guest.get(reverse('api:posts_batch'), {'ids': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_detail_endpoints(self):
+        post = self.posts[0]
+        urls = {
+            reverse('api:post_detail', args=[post.pk]): {'id': post.pk},
+            reverse('api:group_detail', args=['group']): {'slug': 'group'},
+            reverse('api:profile', args=['author']): {'posts_count': 5},
+        }
+        for url, expected in urls.items():
+            with self.subTest(url=url):
+                data = self.guest.get(url).json()
+                for name, value in expected.items():
+                    self.assertEqual(data[name], value)
+        response = self.guest.get(reverse('api:post_detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_comments(self):
+        response = self.guest.get(
+            reverse('api:comments', args=[self.posts[0].pk]))
+        results = response.json()['results']
+        self.assertEqual(results[0]['author'], 'reader')
+        self.assertEqual(results[0]['text'], 'Комментарий')
+
+    def test_follow_requires_login(self):
+        response = self.guest.get(reverse('api:follow'))
+        self.assertEqual(response.status_code, 401)
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(reverse('api:follow'), {'fields': 'id'})
+        self.assertEqual(len(response.json()['results']), 5)
+
+    def test_read_only(self):
+        response = self.guest.post(reverse('api:posts'))
+        self.assertEqual(response.status_code, 405)
@@ -0,0 +1,249 @@
+from functools import partial, wraps
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from core.routers import replica_reads
+from posts.models import Comment, Group, Post, User
+from posts.paginators import CursorPaginator
+from posts.timeline import TimelinePaginator, get_feed
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Сколько id можно запросить одним пакетом.
+MAX_BATCH = 100
+
+# Поле ответа -> путь в ORM. Выбираются только запрошенные столбцы,
+# связанные таблицы присоединяются, только если нужны их поля.
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'excerpt': 'excerpt',
+    'pub_date': 'pub_date',
+    'updated_at': 'updated_at',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'thumbnail_url': 'thumbnail_url',
+    'thumbnail_width': 'thumbnail_width',
+    'thumbnail_height': 'thumbnail_height',
+    'comments_count': 'comments_count',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+GROUP_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'slug': 'slug',
+    'description': 'description',
+}
+PROFILE_FIELDS = {
+    'id': 'id',
+    'username': 'username',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'posts_count': 'stats__posts_count',
+    'followers_count': 'stats__followers_count',
+    'following_count': 'stats__following_count',
+}
+POST_ORDERING = ('-pub_date', '-id')
+COMMENT_ORDERING = ('-created', '-id')
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _media_url(name):
+    return f'{settings.MEDIA_URL}{name}' if name else None
+
+
+# Значения, которые нельзя отдать в том виде, в каком их вернул values().
+CONVERTERS = {
+    'image': _media_url,
+}
+
+
+def error(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+def api_view(view):
+    """
+    Ошибки запроса отдаются JSON-ответом вместо HTML-страницы.
+
+    API только читает, поэтому все его view читают с реплик.
+    """
+    @replica_reads
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return error('Метод не поддерживается.', 405)
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as exc:
+            return error(str(exc), exc.status)
+    return wrapper
+
+
+def selected_fields(request, fields):
+    """Поля из ?fields=id,text; без параметра - все поля ресурса."""
+    requested = request.GET.get('fields')
+    if not requested:
+        return list(fields)
+    names = list(dict.fromkeys(
+        name.strip() for name in requested.split(',') if name.strip()))
+    unknown = [name for name in names if name not in fields]
+    if unknown:
+        raise ApiError(f'Неизвестные поля: {", ".join(unknown)}.')
+    return names
+
+
+def rows(queryset, fields, names, required=()):
+    """
+    values() только с нужными столбцами.
+
+    required - поля, без которых не построить курсор или ответ; они
+    выбираются всегда, но в ответ попадают, только если запрошены.
+    """
+    lookups = [fields[name] for name in names]
+    extra = [lookup for lookup in required if lookup not in lookups]
+    return queryset.values(*lookups, *extra)
+
+
+def serialize(row, fields, names):
+    """Строка values() -> словарь ответа без создания экземпляров модели."""
+    result = {}
+    for name in names:
+        value = row[fields[name]]
+        converter = CONVERTERS.get(name)
+        result[name] = converter(value) if converter else value
+    return result
+
+
+def limit(request):
+    try:
+        value = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError('limit должен быть числом.')
+    return min(max(value, 1), MAX_LIMIT)
+
+
+def paginated(request, queryset, fields, ordering,
+              paginator_class=CursorPaginator):
+    names = selected_fields(request, fields)
+    required = [name.lstrip('-') for name in ordering]
+    paginator = paginator_class(
+        rows(queryset.order_by(*ordering), fields, names, required),
+        limit(request),
+        ordering,
+    )
+    page = paginator.get_page(request.GET.get('cursor'))
+    return JsonResponse({
+        'results': [serialize(row, fields, names) for row in page],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    })
+
+
+def single(request, queryset, fields):
+    names = selected_fields(request, fields)
+    row = rows(queryset, fields, names).first()
+    if row is None:
+        raise ApiError('Не найдено.', 404)
+    return JsonResponse(serialize(row, fields, names))
+
+
+@api_view
+def posts(request):
+    """Лента постов, фильтры ?group=<slug> и ?author=<username>."""
+    queryset = Post.objects.all()
+    if request.GET.get('group'):
+        queryset = queryset.filter(group__slug=request.GET['group'])
+    if request.GET.get('author'):
+        queryset = queryset.filter(author__username=request.GET['author'])
+    return paginated(request, queryset, POST_FIELDS, POST_ORDERING)
+
+
+@api_view
+def post_detail(request, post_id):
+    return single(request, Post.objects.filter(pk=post_id), POST_FIELDS)
+
+
+@api_view
+def posts_batch(request):
+    """
+    Несколько постов одним запросом: ?ids=1,2,3.
+
+    Посты идут в порядке запрошенных id, отсутствующие перечислены в
+    missing.
+    """
+    try:
+        ids = list(dict.fromkeys(
+            int(value) for value in request.GET.get('ids', '').split(',')
+            if value.strip()
+        ))
+    except ValueError:
+        raise ApiError('ids должен быть списком чисел через запятую.')
+    if not ids:
+        raise ApiError('Не указаны ids.')
+    if len(ids) > MAX_BATCH:
+        raise ApiError(f'Не больше {MAX_BATCH} id за запрос.')
+    names = selected_fields(request, POST_FIELDS)
+    found = {
+        row['id']: serialize(row, POST_FIELDS, names)
+        for row in rows(
+            Post.objects.filter(pk__in=ids).order_by(),
+            POST_FIELDS, names, required=['id'],
+        )
+    }
+    return JsonResponse({
+        'results': [found[pk] for pk in ids if pk in found],
+        'missing': [pk for pk in ids if pk not in found],
+    })
+
+
+@api_view
+def comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        raise ApiError('Не найдено.', 404)
+    return paginated(
+        request,
+        Comment.objects.filter(post_id=post_id),
+        COMMENT_FIELDS,
+        COMMENT_ORDERING,
+    )
+
+
+@api_view
+def follow(request):
+    """Лента подписок текущего пользователя."""
+    if not request.user.is_authenticated:
+        raise ApiError('Нужна авторизация.', 401)
+    return paginated(
+        request, get_feed(request.user), POST_FIELDS, POST_ORDERING,
+        partial(TimelinePaginator, user=request.user))
+
+
+@api_view
+def groups(request):
+    return paginated(
+        request, Group.objects.all(), GROUP_FIELDS, ('title', 'id'))
+
+
+@api_view
+def group_detail(request, slug):
+    return single(request, Group.objects.filter(slug=slug), GROUP_FIELDS)
+
+
+@api_view
+def profile(request, username):
+    return single(
+        request, User.objects.filter(username=username), PROFILE_FIELDS)
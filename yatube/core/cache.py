@@ -0,0 +1,268 @@
+import itertools
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+
+
+class TwoTierCache(BaseCache):
+    """
+    Кэш процесса (L1) поверх общего кэша (L2).
+
+    LOCATION - псевдоним общего кэша из settings.CACHES. Локальный уровень
+    ограничен MAX_ENTRIES и вытесняет давно не читанные ключи (LRU). Записи
+    живут в нём не дольше LOCAL_TIMEOUT секунд: удаление ключа в одном
+    процессе доходит до остальных не позже этого срока.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = location or 'default'
+        self._local_timeout = int(options.get('LOCAL_TIMEOUT', 5))
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _local_get(self, key):
+        with self._lock:
+            item = self._local.get(key)
+            if item is None:
+                return None
+            expires, data = item
+            if expires <= time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+        return pickle.loads(data)
+
+    def _local_set(self, key, value, timeout):
+        local_timeout = self._local_timeout
+        if timeout is not None:
+            local_timeout = min(local_timeout, timeout)
+        if local_timeout <= 0:
+            self._local_delete(key)
+            return
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._local[key] = (time.monotonic() + local_timeout, data)
+            self._local.move_to_end(key)
+            while len(self._local) > self._max_entries:
+                self._local.popitem(last=False)
+
+    def _local_delete(self, key):
+        with self._lock:
+            self._local.pop(key, None)
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_key(key, version)
+        value = self._local_get(local_key)
+        if value is not None:
+            return value
+        value = self.shared.get(
+            self._shared_key(key), version=self._version(version))
+        if value is None:
+            return default
+        self._local_set(local_key, value, self.default_timeout)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = []
+        for key in keys:
+            value = self._local_get(self.make_key(key, version))
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            shared = self.shared.get_many(
+                [self._shared_key(key) for key in missing],
+                version=self._version(version),
+            )
+            for key in missing:
+                value = shared.get(self._shared_key(key))
+                if value is not None:
+                    found[key] = value
+                    self._local_set(
+                        self.make_key(key, version), value,
+                        self.default_timeout)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.get_backend_timeout(timeout)
+        self.shared.set(
+            self._shared_key(key), value, timeout,
+            version=self._version(version))
+        self._local_set(self.make_key(key, version), value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.get_backend_timeout(timeout)
+        added = self.shared.add(
+            self._shared_key(key), value, timeout,
+            version=self._version(version))
+        if added:
+            self._local_set(self.make_key(key, version), value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.get_backend_timeout(timeout)
+        return self.shared.touch(
+            self._shared_key(key), timeout,
+            version=self._version(version))
+
+    def delete(self, key, version=None):
+        self._local_delete(self.make_key(key, version))
+        self.shared.delete(
+            self._shared_key(key), version=self._version(version))
+
+    def clear(self):
+        """
+        Очищает только локальный уровень.
+
+        Общий кэш делят ленты и кэш страниц; его очищают через
+        caches[LOCATION].clear().
+        """
+        with self._lock:
+            self._local.clear()
+
+    def get_backend_timeout(self, timeout=DEFAULT_TIMEOUT):
+        if timeout is DEFAULT_TIMEOUT:
+            return self.default_timeout
+        return timeout
+
+    def _shared_key(self, key):
+        # Префикс отделяет ключи этого кэша от остальных ключей L2.
+        return f'{self.key_prefix}:{key}' if self.key_prefix else key
+
+    def _version(self, version):
+        return self.version if version is None else version
+
+
+class RedisCache(BaseCache):
+    """
+    Общий кэш в Redis через redis-py.
+
+    LOCATION - адрес вида redis://host:port/db. OPTIONS['CLIENT_CLASS'] -
+    класс клиента с методом from_url, в тестах его заменяет
+    fakeredis.FakeRedis. Целые числа хранятся как есть, чтобы incr()
+    выполнял сам Redis, остальные значения - в pickle.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._url = location or 'redis://127.0.0.1:6379/0'
+        self._client_class = options.get('CLIENT_CLASS', 'redis.Redis')
+
+    @cached_property
+    def client(self):
+        return import_string(self._client_class).from_url(self._url)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version)
+        self.validate_key(key)
+        return key
+
+    def _expiry(self, timeout):
+        """Срок жизни в миллисекундах, None - бессрочно."""
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return None
+        return max(int(timeout * 1000), 0)
+
+    @staticmethod
+    def _dumps(value):
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _loads(data):
+        try:
+            return int(data)
+        except ValueError:
+            return pickle.loads(data)
+
+    def get(self, key, default=None, version=None):
+        data = self.client.get(self._key(key, version))
+        return default if data is None else self._loads(data)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = self.client.mget([self._key(key, version) for key in keys])
+        return {
+            key: self._loads(data)
+            for key, data in zip(keys, values) if data is not None
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expiry = self._expiry(timeout)
+        if expiry == 0:
+            self.client.delete(key)
+            return
+        self.client.set(key, self._dumps(value), px=expiry)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expiry = self._expiry(timeout)
+        with self.client.pipeline() as pipeline:
+            for key, value in data.items():
+                key = self._key(key, version)
+                if expiry == 0:
+                    pipeline.delete(key)
+                else:
+                    pipeline.set(key, self._dumps(value), px=expiry)
+            pipeline.execute()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        expiry = self._expiry(timeout)
+        if expiry == 0:
+            return False
+        return bool(self.client.set(
+            self._key(key, version), self._dumps(value), px=expiry,
+            nx=True))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expiry = self._expiry(timeout)
+        if expiry is None:
+            return bool(self.client.persist(key)) or self.has_key(key)
+        return bool(self.client.pexpire(key, max(expiry, 1)))
+
+    def delete(self, key, version=None):
+        return bool(self.client.delete(self._key(key, version)))
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self.client.delete(*keys)
+
+    def has_key(self, key, version=None):
+        return bool(self.client.exists(self._key(key, version)))
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        # Ключ без значения - ошибка, как у остальных бэкендов Django.
+        if not self.client.exists(key):
+            raise ValueError(f"Key '{key}' not found")
+        return self.client.incrby(key, delta)
+
+    def clear(self):
+        """Удаляет ключи с KEY_PREFIX, без префикса - всю базу Redis."""
+        if not self.key_prefix:
+            self.client.flushdb()
+            return
+        keys = self.client.scan_iter(match=f'{self.key_prefix}:*')
+        for chunk in iter(lambda: list(itertools.islice(keys, 500)), []):
+            self.client.delete(*chunk)
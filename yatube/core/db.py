@@ -0,0 +1,36 @@
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Имена и значения PRAGMA подставляются в SQL, поэтому из окружения
+# принимаются только слова и числа.
+PRAGMA_VALUE = re.compile(r'^-?\w+$')
+
+
+def pragma_statements(pragmas):
+    statements = []
+    for name, value in pragmas.items():
+        value = str(value)
+        if not (PRAGMA_VALUE.match(name) and PRAGMA_VALUE.match(value)):
+            raise ImproperlyConfigured(
+                f'Недопустимая настройка SQLite: {name} = {value}')
+        statements.append(f'PRAGMA {name} = {value}')
+    return statements
+
+
+def configure_sqlite(connection):
+    """Применяет SQLITE_PRAGMAS к соединению."""
+    with connection.cursor() as cursor:
+        for statement in pragma_statements(settings.SQLITE_PRAGMAS):
+            cursor.execute(statement)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    # Большинство настроек действует только на своё соединение, поэтому
+    # они применяются к каждому новому; режим WAL хранится в файле БД.
+    if connection.vendor == 'sqlite':
+        configure_sqlite(connection)
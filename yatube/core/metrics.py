@@ -0,0 +1,152 @@
+import contextvars
+import functools
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.backends.django import Template
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+PREFIX_SEPARATOR = re.compile(r'[:|]')
+
+
+class RequestMetrics:
+    """Счётчики одного запроса: SQL, кэш и рендер шаблонов."""
+
+    __slots__ = (
+        'db_queries', 'db_time', 'cache_hits', 'cache_misses',
+        'cache_prefixes', 'template_time', '_cache_depth',
+        '_template_depth',
+    )
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Префикс ключа -> [попадания, промахи].
+        self.cache_prefixes = {}
+        self.template_time = 0.0
+        self._cache_depth = 0
+        self._template_depth = 0
+
+    def record_query(self, duration):
+        self.db_queries += 1
+        self.db_time += duration
+
+    def record_cache(self, key, hit):
+        counts = self.cache_prefixes.setdefault(key_prefix(key), [0, 0])
+        if hit:
+            self.cache_hits += 1
+            counts[0] += 1
+        else:
+            self.cache_misses += 1
+            counts[1] += 1
+
+
+def current():
+    """Счётчики текущего запроса или None вне запроса."""
+    return _current.get()
+
+
+def start():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish(token):
+    _current.reset(token)
+
+
+def key_prefix(key):
+    """Группа ключа кэша: 'feed_generation', 'hot', фрагмент шаблона."""
+    key = str(key)
+    if key.startswith('template.cache.'):
+        return key.rsplit('.', 1)[0]
+    return PREFIX_SEPARATOR.split(key, 1)[0]
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    """Обёртка connection.execute_wrapper: число и время запросов."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record_query(time.perf_counter() - started)
+
+
+def _instrument_get(method):
+    @functools.wraps(method)
+    def get(self, key, default=None, version=None):
+        metrics = _current.get()
+        if metrics is None or metrics._cache_depth:
+            return method(self, key, default, version)
+        # Вложенные обращения (двухуровневый кэш читает общий) не
+        # считаются повторно.
+        metrics._cache_depth += 1
+        try:
+            value = method(self, key, default, version)
+        finally:
+            metrics._cache_depth -= 1
+        metrics.record_cache(key, value is not default)
+        return value
+    get.instrumented = True
+    return get
+
+
+def _instrument_get_many(method):
+    @functools.wraps(method)
+    def get_many(self, keys, version=None):
+        metrics = _current.get()
+        if metrics is None or metrics._cache_depth:
+            return method(self, keys, version)
+        keys = list(keys)
+        metrics._cache_depth += 1
+        try:
+            found = method(self, keys, version)
+        finally:
+            metrics._cache_depth -= 1
+        for key in keys:
+            metrics.record_cache(key, key in found)
+        return found
+    get_many.instrumented = True
+    return get_many
+
+
+def _instrument_render(method):
+    @functools.wraps(method)
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None or metrics._template_depth:
+            return method(self, context, request)
+        metrics._template_depth += 1
+        started = time.perf_counter()
+        try:
+            return method(self, context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - started
+            metrics._template_depth -= 1
+    render.instrumented = True
+    return render
+
+
+def instrument():
+    """
+    Подключает учёт обращений к кэшам и рендера шаблонов.
+
+    Оборачиваются методы классов бэкендов из settings.CACHES: экземпляры
+    кэшей создаются заново в каждом потоке. Вне запроса обёртки сразу
+    передают вызов дальше.
+    """
+    classes = {type(caches[alias]) for alias in settings.CACHES}
+    for backend in classes:
+        if not getattr(backend.get, 'instrumented', False):
+            backend.get = _instrument_get(backend.get)
+        if not getattr(backend.get_many, 'instrumented', False):
+            backend.get_many = _instrument_get_many(backend.get_many)
+    if not getattr(Template.render, 'instrumented', False):
+        Template.render = _instrument_render(Template.render)
@@ -0,0 +1,109 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics, prometheus, routers
+
+logger = logging.getLogger('yatube.requests')
+
+
+class RequestMetricsMiddleware:
+    """
+    Время и число SQL-запросов, обращения к кэшу, рендер шаблонов.
+
+    Результат уходит в заголовок Server-Timing и в структурированную
+    строку лога для доли запросов REQUEST_METRICS_SAMPLE_RATE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        metrics.instrument()
+
+    def __call__(self, request):
+        request_metrics, token = metrics.start()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.sql_wrapper))
+                response = self.get_response(request)
+        finally:
+            metrics.finish(token)
+        total = time.perf_counter() - started
+        if settings.REQUEST_METRICS_HEADER:
+            response['Server-Timing'] = server_timing(request_metrics, total)
+        if settings.METRICS_ENABLED:
+            prometheus.observe_request(
+                request, response, request_metrics, total)
+        rate = settings.REQUEST_METRICS_SAMPLE_RATE
+        if rate and random.random() < rate:
+            logger.info(json.dumps(
+                log_record(request, response, request_metrics, total),
+                ensure_ascii=False,
+            ))
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Отправляет чтения view, помеченных replica_reads, на реплику.
+
+    После запроса с записью чтения пользователя REPLICA_PIN_SECONDS идут
+    на primary, чтобы он сразу видел свои изменения несмотря на отставание
+    реплик. Срок отмечает подписанная кука, её видит любой воркер.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = routers.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routers.finish(token)
+        if wrote and request.user.is_authenticated:
+            routers.pin(response, request.user.pk)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (getattr(view_func, 'replica_reads', False)
+                and request.method in ('GET', 'HEAD')
+                and not routers.is_pinned(request)):
+            routers.use_replica()
+
+
+def url_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else None
+
+
+def server_timing(request_metrics, total):
+    return ', '.join((
+        f'db;dur={request_metrics.db_time * 1000:.1f};'
+        f'desc="{request_metrics.db_queries} queries"',
+        f'cache;desc="{request_metrics.cache_hits} hits, '
+        f'{request_metrics.cache_misses} misses"',
+        f'tpl;dur={request_metrics.template_time * 1000:.1f}',
+        f'total;dur={total * 1000:.1f}',
+    ))
+
+
+def log_record(request, response, request_metrics, total):
+    return {
+        'url_name': url_name(request),
+        'method': request.method,
+        'status': response.status_code,
+        'total_ms': round(total * 1000, 2),
+        'db_queries': request_metrics.db_queries,
+        'db_ms': round(request_metrics.db_time * 1000, 2),
+        'cache_hits': request_metrics.cache_hits,
+        'cache_misses': request_metrics.cache_misses,
+        'template_ms': round(request_metrics.template_time * 1000, 2),
+    }
@@ -0,0 +1,386 @@
+import atexit
+import fcntl
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+# Границы корзин гистограмм.
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (1000, 5000, 10000, 25000, 50000, 100000, 250000, 1000000)
+THUMBNAIL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HISTOGRAMS = {
+    'yatube_request_duration_seconds': (
+        'Время обработки запроса.', LATENCY_BUCKETS),
+    'yatube_request_db_queries': (
+        'Число SQL-запросов на один HTTP-запрос.', QUERY_BUCKETS),
+    'yatube_response_size_bytes': (
+        'Размер тела ответа.', SIZE_BUCKETS),
+    'yatube_thumbnail_generation_seconds': (
+        'Время создания миниатюр одного поста.', THUMBNAIL_BUCKETS),
+}
+COUNTERS = {
+    'yatube_db_queries_total': 'SQL-запросы по маршрутам.',
+    'yatube_cache_requests_total': 'Чтения кэша по префиксам ключей.',
+}
+# Маршруты этих пространств имён получают собственную метку.
+NAMESPACES = ('posts', 'users', 'about', 'api')
+# Файл воркера: metrics_<pid>-<время старта>.json. Время старта не даёт
+# воркеру с повторно выданным PID затереть файл предшественника.
+FILE_PATTERN = 'metrics_{}.json'
+# Сумма метрик завершившихся воркеров: их файлы вливаются сюда, чтобы
+# счётчики не уменьшались при перезапуске воркеров.
+DEAD_FILE = 'metrics_dead.json'
+LOCK_FILE = '.metrics.lock'
+
+logger = logging.getLogger('yatube.metrics')
+
+
+class Registry:
+    """
+    Метрики процесса.
+
+    При заданном METRICS_DIR процесс сбрасывает свои значения в
+    собственный файл не чаще METRICS_FLUSH_INTERVAL секунд, а экспорт
+    суммирует файлы всех воркеров.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._counters = defaultdict(float)
+        # (имя, метки) -> [счётчики корзин..., сумма, количество]
+        self._histograms = {}
+        self._flushed = 0.0
+        self._pid = None
+        self._name = None
+
+    def inc(self, name, labels, amount=1):
+        with self._lock:
+            self._counters[(name, labels)] += amount
+        self._maybe_flush()
+
+    def observe(self, name, labels, value):
+        buckets = HISTOGRAMS[name][1]
+        with self._lock:
+            series = self._histograms.get((name, labels))
+            if series is None:
+                series = [0] * (len(buckets) + 2)
+                self._histograms[(name, labels)] = series
+            for position, bound in enumerate(buckets):
+                if value <= bound:
+                    series[position] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+        self._maybe_flush()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [
+                    [name, list(labels), value]
+                    for (name, labels), value in self._counters.items()
+                ],
+                'histograms': [
+                    [name, list(labels), list(series)]
+                    for (name, labels), series in self._histograms.items()
+                ],
+            }
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    @property
+    def file_name(self):
+        """Имя файла процесса; после fork у воркера оно своё."""
+        pid = os.getpid()
+        if self._pid != pid:
+            self._pid = pid
+            self._name = FILE_PATTERN.format(f'{pid}-{time.time_ns()}')
+        return self._name
+
+    def flush(self):
+        if not settings.METRICS_DIR:
+            return
+        with self._flush_lock:
+            self._write(settings.METRICS_DIR)
+
+    def _maybe_flush(self):
+        # Файл пишет один поток, остальные запросы его не ждут.
+        if (not settings.METRICS_DIR
+                or not self._due()
+                or not self._flush_lock.acquire(blocking=False)):
+            return
+        try:
+            if self._due():
+                self._write(settings.METRICS_DIR)
+        finally:
+            self._flush_lock.release()
+
+    def _due(self):
+        interval = settings.METRICS_FLUSH_INTERVAL
+        return time.monotonic() - self._flushed >= interval
+
+    def _write(self, directory):
+        """Атомарно заменяет файл процесса; ошибка записи только в лог."""
+        self._flushed = time.monotonic()
+        try:
+            os.makedirs(directory, exist_ok=True)
+            _replace_json(
+                os.path.join(directory, self.file_name), self.snapshot())
+        except OSError:
+            logger.warning('Не удалось записать метрики', exc_info=True)
+
+
+def _replace_json(path, data):
+    """Пишет JSON во временный файл рядом и подменяет им path."""
+    descriptor, temporary = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix='.metrics_', suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'w') as output:
+            json.dump(data, output)
+        os.replace(temporary, path)
+    except OSError:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        raise
+
+
+registry = Registry()
+atexit.register(registry.flush)
+
+
+def route_label(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    if match.namespace in NAMESPACES:
+        return match.view_name
+    return 'other'
+
+
+def observe_request(request, response, request_metrics, total):
+    """Записывает метрики запроса, собранные RequestMetricsMiddleware."""
+    route = route_label(request)
+    labels = (('method', request.method), ('route', route))
+    registry.observe('yatube_request_duration_seconds', labels, total)
+    registry.observe(
+        'yatube_request_db_queries', labels, request_metrics.db_queries)
+    registry.inc(
+        'yatube_db_queries_total', (('route', route),),
+        request_metrics.db_queries)
+    if not response.streaming:
+        registry.observe(
+            'yatube_response_size_bytes', labels, len(response.content))
+    for prefix, (hits, misses) in request_metrics.cache_prefixes.items():
+        if hits:
+            registry.inc(
+                'yatube_cache_requests_total',
+                (('prefix', prefix), ('result', 'hit')), hits)
+        if misses:
+            registry.inc(
+                'yatube_cache_requests_total',
+                (('prefix', prefix), ('result', 'miss')), misses)
+
+
+def observe_thumbnails(duration):
+    registry.observe('yatube_thumbnail_generation_seconds', (), duration)
+
+
+def _pid_alive(name):
+    """Жив ли процесс, которому принадлежит файл метрик."""
+    pid = name.rsplit('.', 1)[0].split('_', 1)[-1].split('-')[0]
+    try:
+        os.kill(int(pid), 0)
+    except ValueError:
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read(path):
+    with open(path) as source:
+        return json.load(source)
+
+
+def _bury(directory, paths):
+    """
+    Вливает файлы завершившихся воркеров в DEAD_FILE и удаляет их.
+
+    Слияние идёт под файловой блокировкой: экспорт в разных воркерах не
+    сложит один файл дважды. Имена влитых файлов хранятся в DEAD_FILE,
+    поэтому сбой между записью суммы и удалением не удвоит счётчики.
+    """
+    with open(os.path.join(directory, LOCK_FILE), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        dead_path = os.path.join(directory, DEAD_FILE)
+        try:
+            dead = _read(dead_path)
+        except FileNotFoundError:
+            dead = {'counters': [], 'histograms': [], 'merged': []}
+        merged = set(dead['merged'])
+        snapshots = [dead]
+        buried = []
+        for path in paths:
+            name = os.path.basename(path)
+            try:
+                if name not in merged:
+                    snapshots.append(_read(path))
+                buried.append(path)
+            except (OSError, ValueError):
+                continue
+        if not buried:
+            return
+        total = _as_snapshot(*_sum(snapshots))
+        total['merged'] = sorted(
+            merged | {os.path.basename(path) for path in buried})
+        _replace_json(dead_path, total)
+        for path in buried:
+            os.remove(path)
+
+
+def _worker_snapshots():
+    """
+    Метрики других воркеров из файлов METRICS_DIR.
+
+    Файлы завершившихся воркеров переносятся в общую сумму DEAD_FILE.
+    """
+    directory = settings.METRICS_DIR
+    paths = glob.glob(os.path.join(directory, FILE_PATTERN.format('*')))
+    names = {os.path.basename(path): path for path in paths}
+    names.pop(registry.file_name, None)
+    names.pop(DEAD_FILE, None)
+    dead = [path for name, path in names.items() if not _pid_alive(name)]
+    if dead:
+        try:
+            _bury(directory, dead)
+        except (OSError, ValueError):
+            logger.warning('Не удалось слить метрики воркеров', exc_info=True)
+    snapshots = []
+    for path in [*set(names.values()) - set(dead),
+                 os.path.join(directory, DEAD_FILE)]:
+        try:
+            snapshots.append(_read(path))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def _sum(snapshots):
+    counters = defaultdict(float)
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            counters[(name, tuple(map(tuple, labels)))] += value
+        for name, labels, series in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            total = histograms.setdefault(key, [0] * len(series))
+            for position, value in enumerate(series):
+                total[position] += value
+    return counters, histograms
+
+
+def _as_snapshot(counters, histograms):
+    return {
+        'counters': [
+            [name, [list(pair) for pair in labels], value]
+            for (name, labels), value in counters.items()
+        ],
+        'histograms': [
+            [name, [list(pair) for pair in labels], series]
+            for (name, labels), series in histograms.items()
+        ],
+    }
+
+
+def _collect():
+    """Сумма метрик всех воркеров, текущий процесс - из памяти."""
+    snapshots = [registry.snapshot()]
+    if settings.METRICS_DIR:
+        snapshots += _worker_snapshots()
+    return _sum(snapshots)
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    text = ','.join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', r'\\').replace('"', r'\"'),
+        )
+        for name, value in pairs
+    )
+    return f'{{{text}}}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _histogram_lines(name, buckets, labels, series):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(buckets, series):
+        cumulative += count
+        lines.append(
+            f'{name}_bucket{_labels(labels, [("le", bound)])} {cumulative}')
+    lines += [
+        f'{name}_bucket{_labels(labels, [("le", "+Inf")])} {series[-1]}',
+        f'{name}_sum{_labels(labels)} {_number(series[-2])}',
+        f'{name}_count{_labels(labels)} {series[-1]}',
+    ]
+    return lines
+
+
+def _hit_ratio_lines(counters):
+    name = 'yatube_cache_hit_ratio'
+    lines = [
+        f'# HELP {name} Доля попаданий в кэш по префиксам ключей.',
+        f'# TYPE {name} gauge',
+    ]
+    reads = defaultdict(lambda: [0, 0])
+    for (series_name, labels), value in counters.items():
+        if series_name == 'yatube_cache_requests_total':
+            labels = dict(labels)
+            reads[labels['prefix']][labels['result'] == 'miss'] += value
+    for prefix, (hits, misses) in sorted(reads.items()):
+        ratio = hits / (hits + misses)
+        lines.append(f'{name}{_labels([("prefix", prefix)])} {ratio!r}')
+    return lines
+
+
+def render():
+    """Метрики в текстовом формате Prometheus."""
+    counters, histograms = _collect()
+    lines = []
+    for name, help_text in COUNTERS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for (series_name, labels), value in sorted(counters.items()):
+            if series_name == name:
+                lines.append(f'{name}{_labels(labels)} {_number(value)}')
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for (series_name, labels), series in sorted(histograms.items()):
+            if series_name == name:
+                lines += _histogram_lines(name, buckets, labels, series)
+    lines += _hit_ratio_lines(counters)
+    return '\n'.join(lines) + '\n'
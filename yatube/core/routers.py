@@ -0,0 +1,98 @@
+import contextvars
+import random
+
+from django.conf import settings
+
+PRIMARY = 'default'
+# Закрепление живёт в подписанной куке: кэш по умолчанию может быть
+# своим у каждого процесса, а кука приходит в любой из них.
+PIN_COOKIE = 'db_pin'
+PIN_SALT = 'core.routers.pin'
+# Модель строк DatabaseCache: кэш читается и пишется только на primary.
+CACHE_APP_LABEL = 'django_cache'
+
+
+class RoutingState:
+    __slots__ = ('replica', 'wrote')
+
+    def __init__(self):
+        self.replica = None
+        self.wrote = False
+
+
+_state = contextvars.ContextVar('db_routing', default=None)
+
+
+def start():
+    return _state.set(RoutingState())
+
+
+def finish(token):
+    """Завершает запрос; возвращает True, если в нём была запись."""
+    state = _state.get()
+    _state.reset(token)
+    return state.wrote
+
+
+def use_replica():
+    """Чтения до конца запроса уходят на одну случайную реплику."""
+    state = _state.get()
+    if state is not None and settings.DATABASE_REPLICAS:
+        state.replica = random.choice(settings.DATABASE_REPLICAS)
+
+
+def pin(response, user_id):
+    response.set_signed_cookie(
+        PIN_COOKIE, str(user_id), salt=PIN_SALT,
+        max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax')
+
+
+def is_pinned(request):
+    """Пользователь недавно писал и должен читать свои записи с primary."""
+    user = request.user
+    return user.is_authenticated and request.get_signed_cookie(
+        PIN_COOKIE, default=None, salt=PIN_SALT,
+        max_age=settings.REPLICA_PIN_SECONDS,
+    ) == str(user.pk)
+
+
+def replica_reads(view):
+    """Помечает view, которое только читает: его запросы идут на реплику."""
+    view.replica_reads = True
+    return view
+
+
+def _is_cache(model):
+    return model is not None and model._meta.app_label == CACHE_APP_LABEL
+
+
+class PrimaryReplicaRouter:
+    """
+    Запись и чтение вне помеченных view - на primary, чтение помеченных
+    view - на реплику, выбранную ReplicaRoutingMiddleware.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _is_cache(model):
+            # Копия на реплике отстаёт: поколения лент и готовые страницы
+            # оттуда были бы устаревшими.
+            return PRIMARY
+        state = _state.get()
+        if state is not None and state.replica and not state.wrote:
+            return state.replica
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        # Запись в кэш не меняет данные, которые читает пользователь.
+        state = _state.get()
+        if state is not None and not _is_cache(model):
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и на primary.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Реплики получают схему вместе с копией файла primary.
+        return db == PRIMARY
@@ -6,3 +6,16 @@ register = template.Library()
 @register.filter
 def addclass(field, css):
     return field.as_widget(attrs={'class': css})
+
+
+@register.simple_tag(takes_context=True)
+def url_replace(context, **kwargs):
+    """Текущие GET-параметры с заменой переданных, без номера страницы."""
+    query = context['request'].GET.copy()
+    query.pop('page', None)
+    for key, value in kwargs.items():
+        if value is None:
+            query.pop(key, None)
+        else:
+            query[key] = value
+    return f'?{query.urlencode()}' if query else context['request'].path
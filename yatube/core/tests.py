@@ -0,0 +1,389 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from . import db, prometheus, routers, warmup
+from .cache import RedisCache, TwoTierCache
+from .middleware import ReplicaRoutingMiddleware
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shared',
+    },
+}
+
+
+@override_settings(CACHES=CACHES)
+class TwoTierCacheTests(TestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        self.cache = TwoTierCache('shared', {
+            'KEY_PREFIX': 'hot',
+            'OPTIONS': {'MAX_ENTRIES': 2, 'LOCAL_TIMEOUT': 60},
+        })
+
+    def test_read_through(self):
+        """Запись видна в общем кэше, чтение заполняет локальный."""
+        self.cache.set('key', 'value')
+        self.assertEqual(caches['shared'].get('hot:key'), 'value')
+        other = TwoTierCache('shared', {'KEY_PREFIX': 'hot'})
+        self.assertEqual(other.get('key'), 'value')
+        caches['shared'].delete('hot:key')
+        self.assertEqual(other.get('key'), 'value')
+
+    def test_lru_eviction(self):
+        """Локальный уровень вытесняет давно не читанные ключи."""
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.cache.get('a')
+        self.cache.set('c', 3)
+        caches['shared'].clear()
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']),
+                         {'a': 1, 'c': 3})
+
+    def test_delete(self):
+        """Удаление стирает ключ на обоих уровнях."""
+        self.cache.set('key', 'value')
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertIsNone(caches['shared'].get('hot:key'))
+
+    def test_clear_local_only(self):
+        """Очистка не трогает общий кэш, которым пользуются другие."""
+        self.cache.set('key', 'value')
+        caches['shared'].set('page', 'html')
+        self.cache.clear()
+        self.assertEqual(caches['shared'].get('page'), 'html')
+        self.assertEqual(self.cache.get('key'), 'value')
+
+
+class RedisCacheTests(TestCase):
+    LOCATION = 'redis://127.0.0.1:6379/15'
+
+    def make_cache(self, prefix):
+        # fakeredis отвечает по протоколу Redis без сервера.
+        return RedisCache(self.LOCATION, {
+            'KEY_PREFIX': prefix,
+            'OPTIONS': {'CLIENT_CLASS': 'fakeredis.FakeRedis'},
+        })
+
+    def setUp(self):
+        self.cache = self.make_cache('yatube')
+        self.cache.client.flushdb()
+
+    def test_operations(self):
+        """Бэкенд выполняет операции кэша Django."""
+        cache = self.cache
+        cache.set('key', {'value': 1})
+        self.assertEqual(cache.get('key'), {'value': 1})
+        self.assertFalse(cache.add('key', 'other'))
+        self.assertTrue(cache.add('new', 'value'))
+        cache.set_many({'a': 1, 'b': 'два'})
+        self.assertEqual(cache.get_many(['a', 'b', 'c']),
+                         {'a': 1, 'b': 'два'})
+        self.assertEqual(cache.incr('a', 2), 3)
+        with self.assertRaises(ValueError):
+            cache.incr('c')
+        cache.set('gone', 'value', 0)
+        self.assertFalse(cache.has_key('gone'))
+        cache.set('short', 'value', 60)
+        self.assertTrue(cache.touch('short', None))
+        self.assertEqual(cache.client.ttl(cache.make_key('short')), -1)
+        cache.delete_many(['a', 'b'])
+        self.assertTrue(cache.delete('key'))
+        self.assertEqual(cache.get_many(['a', 'b', 'key']), {})
+
+    def test_clear_own_prefix(self):
+        """Очистка удаляет только ключи своего префикса."""
+        other = self.make_cache('other')
+        self.cache.set('key', 'value')
+        other.set('key', 'value')
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(other.get('key'), 'value')
+
+
+# Повторный запрос страницы должен дойти до view и шаблонов.
+@override_settings(PAGE_CACHE_ENABLED=False)
+class RequestMetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_server_timing(self):
+        """Ответ несёт Server-Timing с запросами к БД, кэшу и шаблонам."""
+        response = self.client.get(reverse('posts:index'))
+        header = response['Server-Timing']
+        for metric in ('db;dur=', 'cache;desc=', 'tpl;dur=', 'total;dur='):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, header)
+        self.assertIn('2 queries', header)
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=1)
+    def test_sampled_log(self):
+        """Строка лога помечена именем маршрута и считает промахи кэша."""
+        with self.assertLogs('yatube.requests') as logs:
+            self.client.get(reverse('posts:index'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['url_name'], 'posts:index')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['db_queries'], 2)
+        self.assertGreater(record['cache_misses'], 0)
+        with self.assertLogs('yatube.requests') as logs:
+            self.client.get(reverse('posts:index'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['cache_misses'], 0)
+        self.assertGreater(record['cache_hits'], 0)
+        self.assertGreater(record['template_ms'], 0)
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0)
+    def test_log_disabled(self):
+        """При нулевой доле строки лога не пишутся."""
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('yatube.requests'):
+                self.client.get(reverse('posts:index'))
+
+
+@override_settings(PAGE_CACHE_ENABLED=False)
+class MetricsEndpointTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        prometheus.registry.clear()
+
+    def test_request_metrics(self):
+        """Эндпоинт отдаёт гистограммы по именам маршрутов и доли кэша."""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('about:author'))
+        text = self.client.get('/metrics').content.decode()
+        self.assertIn(
+            'yatube_request_duration_seconds_count'
+            '{method="GET",route="posts:index"} 2', text)
+        self.assertIn(
+            'yatube_request_duration_seconds_count'
+            '{method="GET",route="about:author"} 1', text)
+        self.assertIn(
+            'yatube_db_queries_total{route="posts:index"} 4', text)
+        self.assertIn('yatube_response_size_bytes_bucket', text)
+        self.assertIn(
+            'yatube_cache_hit_ratio{prefix="template.cache.index_page"} 0.5',
+            text)
+
+    def test_workers_aggregated(self):
+        """Метрики других воркеров суммируются из файлов каталога."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        other = {
+            'counters': [[
+                'yatube_db_queries_total', [['route', 'posts:index']], 5,
+            ]],
+            'histograms': [],
+        }
+        name = f'metrics_{os.getppid()}-1.json'
+        with open(os.path.join(directory, name), 'w') as output:
+            json.dump(other, output)
+        with override_settings(
+                METRICS_DIR=directory, METRICS_FLUSH_INTERVAL=0):
+            self.client.get(reverse('posts:index'))
+            text = self.client.get('/metrics').content.decode()
+            self.assertTrue(os.path.exists(os.path.join(
+                directory, prometheus.registry.file_name)))
+        self.assertIn(
+            'yatube_db_queries_total{route="posts:index"} 7', text)
+
+    def test_dead_worker_removed(self):
+        """Метрики завершившегося воркера переносятся в общую сумму."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        process = subprocess.Popen(['true'])
+        process.wait()
+        path = os.path.join(directory, f'metrics_{process.pid}-1.json')
+        with open(path, 'w') as output:
+            json.dump({
+                'counters': [[
+                    'yatube_db_queries_total', [['route', 'posts:index']], 5,
+                ]],
+                'histograms': [],
+            }, output)
+        with override_settings(METRICS_DIR=directory):
+            for _ in range(2):
+                text = self.client.get('/metrics').content.decode()
+                self.assertIn(
+                    'yatube_db_queries_total{route="posts:index"} 5', text)
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(
+            os.path.exists(os.path.join(directory, prometheus.DEAD_FILE)))
+
+    def test_concurrent_flush(self):
+        """Одновременная запись из потоков не приводит к ошибкам."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        prometheus.registry.inc('yatube_db_queries_total', ())
+        errors = []
+
+        def flush():
+            try:
+                for _ in range(20):
+                    prometheus.registry.flush()
+            except Exception as exc:
+                errors.append(exc)
+
+        with override_settings(METRICS_DIR=directory):
+            threads = [threading.Thread(target=flush) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            os.listdir(directory), [prometheus.registry.file_name])
+
+    def test_flush_error_logged(self):
+        """Ошибка записи метрик не роняет запрос."""
+        path = os.path.join(tempfile.mkdtemp(), 'file')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        open(path, 'w').close()
+        with override_settings(METRICS_DIR=path, METRICS_FLUSH_INTERVAL=0):
+            with self.assertLogs('yatube.metrics', 'WARNING'):
+                response = self.client.get(reverse('about:author'))
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.1'])
+    def test_allowed_ips(self):
+        """Чужим адресам эндпоинт недоступен."""
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    @override_settings(METRICS_ALLOWED_IPS=[])
+    def test_no_allowed_ips(self):
+        """Без списка адресов эндпоинт закрыт для всех."""
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+
+class WarmupTests(TestCase):
+    def test_template_names(self):
+        """Прогреваются базовый шаблон и шаблоны постов."""
+        names = list(warmup.template_names())
+        self.assertIn('base.html', names)
+        self.assertIn(os.path.join('posts', 'index.html'), names)
+        self.assertIn(os.path.join('posts', 'includes', 'image.html'), names)
+
+    def test_phases(self):
+        """Фазы прогрева выполняются без ошибок."""
+        for phase in (warmup.imports, warmup.urls, warmup.templates):
+            with self.subTest(phase=phase.__name__):
+                phase()
+
+
+class SqliteTuningTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    @override_settings(SQLITE_PRAGMAS={
+        'busy_timeout': '1234', 'cache_size': '-1000', 'temp_store': 'memory'})
+    def test_pragmas(self):
+        """Настройки из SQLITE_PRAGMAS применяются к соединению."""
+        db.configure_sqlite(connection)
+        self.assertEqual(self.pragma('busy_timeout'), 1234)
+        self.assertEqual(self.pragma('cache_size'), -1000)
+        self.assertEqual(self.pragma('temp_store'), 2)
+
+    def test_invalid_pragma(self):
+        """Значения с посторонними символами не попадают в SQL."""
+        with self.assertRaises(ImproperlyConfigured):
+            db.pragma_statements({'cache_size': '1; DROP TABLE posts_post'})
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='writer')
+
+    def setUp(self):
+        caches['default'].clear()
+        self.router = routers.PrimaryReplicaRouter()
+
+    def route(self, user, method='get', marked=True, write=False,
+              model=None, cookies=None):
+        """
+        Прогоняет запрос через middleware, возвращает базу для чтения.
+
+        Ответ остаётся в self.response.
+        """
+        used = []
+
+        def view(request):
+            if write:
+                self.router.db_for_write(model)
+            used.append(self.router.db_for_read(model))
+            return HttpResponse()
+        if marked:
+            routers.replica_reads(view)
+        middleware = ReplicaRoutingMiddleware(
+            lambda request: (
+                middleware.process_view(request, view, (), {})
+                or view(request)))
+        request = getattr(RequestFactory(), method)('/')
+        request.COOKIES.update(cookies or {})
+        request.user = user
+        self.response = middleware(request)
+        return used[0]
+
+    def test_outside_request(self):
+        """Вне запроса чтение идёт на primary."""
+        self.assertEqual(self.router.db_for_read(None), 'default')
+
+    def test_read_only_views(self):
+        """С реплики читают только помеченные view в GET-запросах."""
+        anonymous = AnonymousUser()
+        self.assertEqual(self.route(anonymous), 'replica1')
+        self.assertEqual(self.route(anonymous, marked=False), 'default')
+        self.assertEqual(self.route(anonymous, method='post'), 'default')
+
+    def test_read_after_write(self):
+        """После записи чтения идут на primary до конца запроса."""
+        self.assertEqual(self.route(self.user, write=True), 'default')
+
+    def test_pin_after_write(self):
+        """Записавший пользователь какое-то время читает с primary."""
+        self.route(self.user, method='post', marked=False, write=True)
+        cookies = {
+            routers.PIN_COOKIE:
+                self.response.cookies[routers.PIN_COOKIE].value,
+        }
+        self.assertEqual(self.route(self.user, cookies=cookies), 'default')
+        self.assertEqual(self.route(self.user), 'replica1')
+        other = get_user_model().objects.create_user(username='other')
+        self.assertEqual(self.route(other, cookies=cookies), 'replica1')
+        forged = {routers.PIN_COOKIE: str(self.user.pk)}
+        self.assertEqual(self.route(self.user, cookies=forged), 'replica1')
+        with override_settings(REPLICA_PIN_SECONDS=-1):
+            self.assertEqual(
+                self.route(self.user, cookies=cookies), 'replica1')
+
+    def test_database_cache_on_primary(self):
+        """Строки DatabaseCache читаются с primary и не закрепляют его."""
+        entry = DatabaseCache('cache_table', {}).cache_model_class
+        self.assertEqual(self.route(self.user, model=entry), 'default')
+        self.assertEqual(
+            self.route(self.user, method='post', marked=False, write=True,
+                       model=entry),
+            'default')
+        self.assertNotIn(routers.PIN_COOKIE, self.response.cookies)
@@ -0,0 +1,128 @@
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.template import engines
+from django.template.loader import get_template
+from django.urls import get_resolver
+from django.utils.functional import empty
+
+from . import prometheus
+
+logger = logging.getLogger('yatube.warmup')
+
+# Шаблоны, которые компилируются заранее: каталоги внутри TEMPLATES_DIR.
+TEMPLATE_FOLDERS = ('posts', 'includes', 'core')
+
+
+def imports():
+    """Загружает PIL и движок sorl-thumbnail, иначе это делает 1-й запрос."""
+    from PIL import Image
+    from sorl.thumbnail import default
+
+    Image.init()
+    for lazy in (default.backend, default.engine, default.kvstore):
+        if lazy._wrapped is empty:
+            lazy._setup()
+
+
+def urls():
+    """Заполняет словари резолвера URL и пространств имён."""
+    resolver = get_resolver()
+    resolver.reverse_dict
+    resolver.namespace_dict
+    resolver.app_dict
+
+
+def template_names():
+    yield 'base.html'
+    for folder in TEMPLATE_FOLDERS:
+        root = os.path.join(settings.TEMPLATES_DIR, folder)
+        for path, _, files in os.walk(root):
+            for name in sorted(files):
+                if name.endswith('.html'):
+                    full = os.path.join(path, name)
+                    yield os.path.relpath(full, settings.TEMPLATES_DIR)
+
+
+def templates():
+    """
+    Компилирует шаблоны лент заранее.
+
+    Скомпилированные шаблоны хранит кэширующий загрузчик, который Django
+    включает при DEBUG = False; с отладкой эта фаза ничего не сохраняет.
+    """
+    for engine in engines.all():
+        engine.engine.template_loaders
+    for name in template_names():
+        get_template(name.replace(os.sep, '/'))
+
+
+def pages():
+    """
+    Заполняет кэши страницами лент, если включён WARM_CACHE_ON_BOOT.
+
+    Локальный кэш мастера достаётся воркерам при fork.
+    """
+    if not settings.WARM_CACHE_ON_BOOT:
+        return
+    from posts import warming
+
+    warming.warm(
+        warming.targets(
+            settings.WARM_CACHE_INDEX_PAGES, settings.WARM_CACHE_AUTHORS),
+        settings.WARM_CACHE_WORKERS,
+        settings.WARM_CACHE_BUDGET,
+    )
+    # Запросы прогрева не должны попасть в метрики воркеров.
+    prometheus.registry.clear()
+
+
+def database():
+    """
+    Открывает соединения и закрывает их.
+
+    Соединение, открытое до fork, нельзя делить между воркерами, поэтому
+    в мастере проверяется только подключение и импорт драйвера, а воркер
+    открывает своё соединение в post_fork.
+    """
+    for connection in connections.all():
+        connection.ensure_connection()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    connections.close_all()
+
+
+PHASES = (
+    ('imports', imports),
+    ('urls', urls),
+    ('templates', templates),
+    ('pages', pages),
+    ('database', database),
+)
+
+
+def run():
+    """Прогревает процесс по фазам, возвращает длительность каждой."""
+    timings = {}
+    for name, phase in PHASES:
+        started = time.perf_counter()
+        try:
+            phase()
+        except Exception:
+            logger.exception('Прогрев "%s" не удался', name)
+        timings[name] = time.perf_counter() - started
+    logger.info(
+        'Прогрев: %s',
+        ', '.join(f'{name} {value * 1000:.1f} мс'
+                  for name, value in timings.items()),
+    )
+    return timings
+
+
+def connect():
+    """Открывает соединения с БД в новом воркере."""
+    for connection in connections.all():
+        connection.ensure_connection()
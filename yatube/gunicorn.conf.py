@@ -0,0 +1,10 @@
+# gunicorn -c gunicorn.conf.py yatube.wsgi
+# Приложение и прогрев (core.warmup) загружаются в мастере до fork,
+# воркеры получают готовое состояние через copy-on-write.
+preload_app = True
+
+
+def post_fork(server, worker):
+    from core import warmup
+
+    warmup.connect()
@@ -0,0 +1,275 @@
+import itertools
+import math
+import random
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+
+from . import excerpts
+from .models import Comment, Follow, Group, Post, TimelineEntry, User
+from .urls import app_name, urlpatterns
+
+USERNAME_PREFIX = 'bench_'
+WORDS = (
+    'кактус', 'фикус', 'город', 'море', 'книга', 'поезд', 'утро', 'лес',
+    'письмо', 'музыка', 'дорога', 'окно', 'кофе', 'снег', 'река', 'песня',
+    'работа', 'друг', 'вечер', 'небо', 'код', 'сад', 'кот', 'мост',
+)
+SEARCH_QUERY = WORDS[0]
+# Маршруты, которые меняют данные, в замеры не входят.
+MUTATING = {'add_comment', 'profile_follow', 'profile_unfollow'}
+QUERY_PARAMS = {'search': {'q': SEARCH_QUERY}}
+
+
+def _popularity(count, alpha):
+    """Накопленные веса степенного закона: i-й по счёту популярнее."""
+    return list(itertools.accumulate(
+        1 / (rank + 1) ** alpha for rank in range(count)))
+
+
+def _text(rng):
+    return ' '.join(rng.choices(WORDS, k=rng.randint(5, 60))).capitalize()
+
+
+def _chunks(items, size):
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def seed(users, posts, groups, comments, follows, alpha=1.0,
+         batch_size=5000, random_seed=0, log=None):
+    """
+    Заполняет БД синтетическими данными пачками bulk_create.
+
+    Сигналы при этом не срабатывают, поэтому ленты подписок раскладываются
+    здесь же, а счётчики и поисковый индекс нужно пересчитать отдельно.
+    """
+    rng = random.Random(random_seed)
+    log = log or (lambda message: None)
+    password = make_password(None)
+    with transaction.atomic():
+        User.objects.bulk_create(
+            (User(username=f'{USERNAME_PREFIX}{number}', password=password)
+             for number in range(users)),
+            batch_size=batch_size,
+        )
+        user_ids = list(User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).order_by('pk').values_list('pk', flat=True))
+        Group.objects.bulk_create(
+            (Group(title=f'Группа {number}', slug=f'bench-{number}',
+                   description=_text(rng))
+             for number in range(groups)),
+            batch_size=batch_size,
+        )
+        group_ids = list(Group.objects.filter(
+            slug__startswith='bench-'
+        ).values_list('pk', flat=True))
+    log(f'Пользователей: {len(user_ids)}, групп: {len(group_ids)}')
+
+    weights = _popularity(len(user_ids), alpha)
+    follow_pairs = set()
+    for user_id in user_ids:
+        # Число подписок тоже распределено по степенному закону со
+        # средним около follows.
+        wanted = min(
+            len(user_ids) - 1,
+            int(follows * rng.paretovariate(1.5) / 3),
+        )
+        chosen = rng.choices(user_ids, cum_weights=weights, k=wanted)
+        follow_pairs.update(
+            (user_id, author_id) for author_id in chosen
+            if author_id != user_id
+        )
+    for chunk in _chunks(follow_pairs, batch_size):
+        Follow.objects.bulk_create(
+            [Follow(user_id=user_id, author_id=author_id)
+             for user_id, author_id in chunk],
+            ignore_conflicts=True,
+        )
+    log(f'Подписок: {len(follow_pairs)}')
+
+    post_authors = defaultdict(list)
+    created = 0
+    for chunk in _chunks(range(posts), batch_size):
+        batch = [
+            Post(
+                author_id=rng.choices(user_ids, cum_weights=weights)[0],
+                group_id=(
+                    rng.choice(group_ids)
+                    if group_ids and rng.random() < 0.5 else None
+                ),
+                text=_text(rng),
+            )
+            for _ in chunk
+        ]
+        for post in batch:
+            excerpts.fill(post)
+        Post.objects.bulk_create(batch)
+        created += len(batch)
+        log(f'Постов: {created}')
+    for post_id, author_id, pub_date in Post.objects.filter(
+        author__username__startswith=USERNAME_PREFIX
+    ).values_list('pk', 'author_id', 'pub_date').iterator():
+        post_authors[author_id].append((post_id, pub_date))
+    post_ids = [
+        post_id for post_id, _ in itertools.chain.from_iterable(
+            post_authors.values())
+    ]
+
+    for chunk in _chunks(range(comments if post_ids else 0), batch_size):
+        Comment.objects.bulk_create([
+            Comment(
+                post_id=rng.choice(post_ids),
+                author_id=rng.choice(user_ids),
+                text=_text(rng),
+            )
+            for _ in chunk
+        ])
+    log(f'Комментариев: {comments if post_ids else 0}')
+
+    followers = defaultdict(int)
+    for _, author_id in follow_pairs:
+        followers[author_id] += 1
+    entries = (
+        TimelineEntry(
+            user_id=user_id, post_id=post_id, author_id=author_id,
+            pub_date=pub_date)
+        for user_id, author_id in follow_pairs
+        if followers[author_id] < settings.TIMELINE_CELEBRITY_FOLLOWERS
+        for post_id, pub_date in post_authors[author_id]
+    )
+    for chunk in _chunks(entries, batch_size):
+        TimelineEntry.objects.bulk_create(chunk, ignore_conflicts=True)
+
+
+def flush():
+    """Удаляет синтетические данные прошлых прогонов."""
+    User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+    Group.objects.filter(slug__startswith='bench-').delete()
+
+
+def percentile(values, fraction):
+    """Перцентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+def sample_kwargs():
+    """Аргументы маршрутов: самые наполненные группа, автор и пост."""
+    group = Group.objects.annotate(
+        total=Count('posts')).order_by('-total', 'pk').first()
+    author = User.objects.order_by(
+        '-stats__posts_count', 'pk').first()
+    post = Post.objects.order_by('-comments_count', '-pk').first()
+    return {
+        'slug': group.slug if group else 'missing',
+        'username': author.username if author else 'missing',
+        'post_id': post.pk if post else 0,
+        'feed_format': 'atom',
+    }
+
+
+def reader():
+    """Читатель с самой длинной лентой подписок."""
+    return User.objects.order_by('-stats__following_count', 'pk').first()
+
+
+def routes():
+    """Имена и аргументы маршрутов posts.urls, доступных через GET."""
+    kwargs = sample_kwargs()
+    for pattern in urlpatterns:
+        if not isinstance(pattern, URLPattern) or pattern.name in MUTATING:
+            continue
+        converters = pattern.pattern.converters
+        yield (
+            pattern.name,
+            f'{app_name}:{pattern.name}',
+            {name: kwargs[name] for name in converters},
+        )
+
+
+def _measure(client, url, params, iterations, warmup):
+    for _ in range(warmup):
+        client.get(url, params)
+    timings, queries, sizes = [], [], []
+    status = None
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(url, params)
+            if response.streaming:
+                size = sum(len(chunk) for chunk in response.streaming_content)
+            else:
+                size = len(response.content)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured))
+        sizes.append(size)
+        status = response.status_code
+    return {
+        'status': status,
+        'p50_ms': round(percentile(timings, 0.50), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'queries': max(queries),
+        'bytes': max(sizes),
+    }
+
+
+def run(iterations, warmup=1):
+    """Замеры каждого маршрута для гостя и для авторизованного читателя."""
+    anonymous = Client()
+    authorized = Client()
+    user = reader()
+    if user is not None:
+        authorized.force_login(user)
+    results = []
+    for name, view_name, kwargs in routes():
+        url = reverse(view_name, kwargs=kwargs)
+        params = QUERY_PARAMS.get(name, {})
+        for role, client in (('anonymous', anonymous),
+                             ('authorized', authorized)):
+            results.append({
+                'route': name,
+                'user': role,
+                'url': url,
+                **_measure(client, url, params, iterations, warmup),
+            })
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Маршруты, ставшие медленнее порога или делающие больше запросов."""
+    previous = {
+        (row['route'], row['user']): row for row in baseline['routes']
+    }
+    regressions = []
+    for row in results:
+        old = previous.get((row['route'], row['user']))
+        if old is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'bytes'):
+            if row[metric] > old[metric] * (1 + threshold):
+                regressions.append(
+                    f'{row["route"]} ({row["user"]}): {metric} '
+                    f'{old[metric]} -> {row[metric]}'
+                )
+        if row['queries'] > old['queries']:
+            regressions.append(
+                f'{row["route"]} ({row["user"]}): queries '
+                f'{old["queries"]} -> {row["queries"]}'
+            )
+    return regressions
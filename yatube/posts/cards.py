@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+# Ключ меняется при сохранении поста (updated_at) и при выкладке новой
+# версии шаблонов, поэтому старые карточки не сбрасываются, а вытесняются.
+CARD_KEY = 'post_card:{}:{}:{}'
+
+
+def card_key(post):
+    return CARD_KEY.format(
+        settings.PAGE_VERSION, post.pk, post.updated_at.timestamp())
+
+
+def render_cards(posts):
+    """
+    HTML карточек постов в исходном порядке.
+
+    Готовые карточки читаются одним get_many, заново рисуются и
+    сохраняются одним set_many только отсутствующие в кэше.
+    """
+    posts = list(posts)
+    keys = [card_key(post) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {
+        key: render_to_string(CARD_TEMPLATE, {'post': post})
+        for key, post in zip(keys, posts) if key not in cards
+    }
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_TIMEOUT)
+        cards.update(missing)
+    return [cards[key] for key in keys]
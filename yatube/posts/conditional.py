@@ -0,0 +1,112 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, quote_etag)
+from django.utils.http import http_date
+
+from .feed_cache import (
+    INDEX_FEED, comments_feed, follow_feed, followers_feed, get_state,
+    group_feed, profile_feed)
+from .lookups import get_group_or_404
+from .models import Post, User
+
+
+def conditional_page(validators):
+    """
+    Отвечает 304, пока не изменились ETag и Last-Modified страницы.
+
+    validators(request, *args, **kwargs) возвращает пару (ETag, время
+    изменения в секундах) или None, если страницы нет: тогда view
+    вызывается как обычно. Валидаторы считаются по поколениям лент и
+    одному агрегатному запросу, без основного запроса страницы.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            found = validators(request, *args, **kwargs)
+            if found is None:
+                return view(request, *args, **kwargs)
+            etag, last_modified = found
+            etag = quote_etag(etag)
+            last_modified = int(last_modified)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response.setdefault('ETag', etag)
+                response.setdefault('Last-Modified', http_date(last_modified))
+                # Браузер и прокси переспрашивают страницу каждый раз,
+                # страницы пользователей в общий кэш не попадают.
+                if request.user.is_authenticated:
+                    patch_cache_control(response, no_cache=True, private=True)
+                else:
+                    patch_cache_control(response, no_cache=True, public=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def _validators(request, feeds, newest, *parts):
+    """ETag и Last-Modified по поколениям лент и свежайшей записи."""
+    user_id = request.user.pk if request.user.is_authenticated else 0
+    newest = newest.timestamp() if newest else 0
+    generation, changed = get_state(*feeds)
+    raw = ':'.join(str(part) for part in (
+        settings.PAGE_VERSION,
+        generation,
+        newest,
+        user_id,
+        request.GET.urlencode(),
+        *parts,
+    ))
+    return hashlib.md5(raw.encode()).hexdigest(), max(changed, newest)
+
+
+def index_validators(request):
+    newest = Post.objects.aggregate(newest=Max('pub_date'))['newest']
+    return _validators(request, [INDEX_FEED], newest)
+
+
+def group_validators(request, slug):
+    group = get_group_or_404(slug)
+    newest = Post.objects.filter(
+        group_id=group.pk
+    ).aggregate(newest=Max('pub_date'))['newest']
+    return _validators(request, [group_feed(group.pk)], newest, group.pk)
+
+
+def profile_validators(request, username):
+    found = User.objects.filter(username=username).annotate(
+        newest=Max('posts__pub_date')
+    ).values_list('pk', 'newest').first()
+    if found is None:
+        return None
+    author_id, newest = found
+    feeds = [
+        profile_feed(author_id),
+        follow_feed(author_id),
+        followers_feed(author_id),
+    ]
+    return _validators(request, feeds, newest, author_id)
+
+
+def post_validators(request, post_id):
+    found = Post.objects.filter(pk=post_id).order_by().annotate(
+        newest_comment=Max('comments__created')
+    ).values_list(
+        'author_id', 'group_id', 'pub_date', 'newest_comment'
+    ).first()
+    if found is None:
+        return None
+    author_id, group_id, pub_date, newest_comment = found
+    newest = max(filter(None, (pub_date, newest_comment)))
+    feeds = [profile_feed(author_id), comments_feed(post_id)]
+    if group_id is not None:
+        feeds.append(group_feed(group_id))
+    return _validators(request, feeds, newest, post_id)
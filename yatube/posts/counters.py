@@ -0,0 +1,76 @@
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import Comment, Follow, Post, UserStats
+
+
+def increment(user_id, field):
+    """Атомарно увеличивает счётчик пользователя, создавая запись."""
+    stats = UserStats.objects.filter(user_id=user_id)
+    if not stats.update(**{field: F(field) + 1}):
+        UserStats.objects.get_or_create(user_id=user_id)
+        stats.update(**{field: F(field) + 1})
+
+
+def decrement(user_id, field):
+    """Атомарно уменьшает счётчик, не опускаясь ниже нуля."""
+    return UserStats.objects.filter(
+        user_id=user_id, **{f'{field}__gt': 0}
+    ).update(**{field: F(field) - 1})
+
+
+def decrement_value(user_id, field):
+    """
+    decrement() и новое значение счётчика; None, если он уже был нулём.
+
+    Значение читается в той же транзакции после UPDATE, поэтому каждое
+    уменьшение видит своё значение, даже если записи удаляются пачкой.
+    """
+    with transaction.atomic():
+        if not decrement(user_id, field):
+            return None
+        return UserStats.objects.filter(
+            user_id=user_id).values_list(field, flat=True).get()
+
+
+def change_comments(post_id, delta):
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comments_count__gt=0)
+    posts.update(comments_count=F('comments_count') + delta)
+
+
+def _grouped(queryset, field, ids):
+    return dict(queryset.filter(
+        **{f'{field}__in': ids}
+    ).order_by().values(field).annotate(
+        total=Count('pk')
+    ).values_list(field, 'total'))
+
+
+def reconcile_users(user_ids):
+    """Пересчитывает счётчики пачки пользователей."""
+    posts = _grouped(Post.objects, 'author', user_ids)
+    followers = _grouped(Follow.objects, 'author', user_ids)
+    following = _grouped(Follow.objects, 'user', user_ids)
+    existing = UserStats.objects.in_bulk(user_ids)
+    created, updated = [], []
+    for user_id in user_ids:
+        stats = existing.get(user_id) or UserStats(user_id=user_id)
+        stats.posts_count = posts.get(user_id, 0)
+        stats.followers_count = followers.get(user_id, 0)
+        stats.following_count = following.get(user_id, 0)
+        (updated if user_id in existing else created).append(stats)
+    UserStats.objects.bulk_create(created)
+    UserStats.objects.bulk_update(
+        updated, ['posts_count', 'followers_count', 'following_count'])
+
+
+def reconcile_posts(post_ids):
+    """Пересчитывает число комментариев пачки постов."""
+    comments = _grouped(Comment.objects, 'post', post_ids)
+    posts = [
+        Post(pk=post_id, comments_count=comments.get(post_id, 0))
+        for post_id in post_ids
+    ]
+    Post.objects.bulk_update(posts, ['comments_count'])
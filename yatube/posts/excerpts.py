@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.utils import timezone
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+from .feed_cache import INDEX_FEED, bump, group_feed, profile_feed
+from .management.utils import batches
+from .models import Post
+
+
+def fill(post):
+    """Начало текста для лент и весь текст в HTML для страницы поста."""
+    post.excerpt = Truncator(post.text).chars(settings.POST_EXCERPT_LENGTH)
+    post.text_html = linebreaks(post.text, autoescape=True)
+
+
+def backfill(batch_size=1000, everything=False):
+    """
+    Заполняет поля пачками, возвращает число обработанных постов.
+
+    По умолчанию только посты с пустым excerpt, everything - все, например
+    после смены POST_EXCERPT_LENGTH. Посты получают новый updated_at, а
+    их ленты - новое поколение, чтобы карточки и страницы пересобрались.
+    """
+    posts = Post.objects.all()
+    if not everything:
+        posts = posts.filter(excerpt='').exclude(text='')
+    done = 0
+    for ids in batches(posts, batch_size):
+        batch = list(Post.objects.filter(pk__in=ids).only(
+            'text', 'author', 'group'))
+        now = timezone.now()
+        for post in batch:
+            fill(post)
+            post.updated_at = now
+        Post.objects.bulk_update(
+            batch, ['excerpt', 'text_html', 'updated_at'])
+        # Одно поколение на пачку вместо bump_post() на каждый пост.
+        bump(
+            INDEX_FEED,
+            *{profile_feed(post.author_id) for post in batch},
+            *{group_feed(post.group_id) for post in batch if post.group_id},
+        )
+        done += len(batch)
+    return done
@@ -0,0 +1,98 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+GENERATION_KEY = 'feed_generation:{}'
+CHANGED_KEY = 'feed_changed:{}'
+INDEX_FEED = 'index'
+
+
+def _initial():
+    # Вытесненное из кэша поколение не должно повторить старое значение.
+    return int(time.time() * 1000)
+
+
+def get_generation(*feeds):
+    """Версия содержимого лент, входящая в ключ кэша фрагментов."""
+    keys = [GENERATION_KEY.format(feed) for feed in feeds]
+    found = cache.get_many(keys)
+    missing = {key: _initial() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return '.'.join(str(found[key]) for key in keys)
+
+
+def get_state(*feeds):
+    """
+    Поколение лент и время их последнего изменения одним чтением кэша.
+
+    Неизвестное время изменения считается текущим, как и поколение:
+    после вытеснения ключей страница просто перестаёт совпадать.
+    """
+    now = time.time()
+    generation_keys = [GENERATION_KEY.format(feed) for feed in feeds]
+    changed_keys = [CHANGED_KEY.format(feed) for feed in feeds]
+    found = cache.get_many(generation_keys + changed_keys)
+    missing = {key: _initial() for key in generation_keys
+               if key not in found}
+    missing.update(
+        (key, now) for key in changed_keys if key not in found)
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    generation = '.'.join(str(found[key]) for key in generation_keys)
+    return generation, max(found[key] for key in changed_keys)
+
+
+def bump(*feeds):
+    """Делает устаревшими все закэшированные фрагменты лент."""
+    feeds = set(feeds)
+    for feed in feeds:
+        key = GENERATION_KEY.format(feed)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial(), None)
+    now = time.time()
+    cache.set_many({CHANGED_KEY.format(feed): now for feed in feeds}, None)
+
+
+def bump_post(post):
+    """Сбрасывает ленты, в которых виден пост, в том числе прежней группы."""
+    groups = {post.group_id, getattr(post, '_loaded_group_id', None)} - {None}
+    bump(
+        INDEX_FEED,
+        profile_feed(post.author_id),
+        *(group_feed(group_id) for group_id in groups),
+    )
+
+
+def feed_cache(*feeds):
+    """Контекст для тега {% cache %} в шаблонах лент."""
+    return {
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+        'feed_version': get_generation(*feeds),
+    }
+
+
+def group_feed(group_id):
+    return f'group:{group_id}'
+
+
+def profile_feed(author_id):
+    return f'profile:{author_id}'
+
+
+def follow_feed(user_id):
+    return f'follow:{user_id}'
+
+
+def followers_feed(author_id):
+    """Подписчики автора: их число и кнопка подписки в профиле."""
+    return f'followers:{author_id}'
+
+
+def comments_feed(post_id):
+    return f'comments:{post_id}'
@@ -1,5 +1,6 @@
 from django import forms
-from .models import Post, Comment
+from . import thumbnails
+from .models import Post, Comment, Group, User
 
 
 class PostForm(forms.ModelForm):
@@ -7,8 +8,42 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image',)
 
+    def save(self, commit=True):
+        if 'image' in self.changed_data:
+            # Миниатюры старой картинки больше не подходят.
+            self.instance.thumbnail_url = ''
+            self.instance.thumbnail_width = None
+            self.instance.thumbnail_height = None
+        return super().save(commit)
+
+    def schedule_thumbnails(self):
+        """Запускает создание миниатюр, если картинка изменилась."""
+        if 'image' in self.changed_data and self.instance.image:
+            thumbnails.schedule(self.instance)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
         fields = ('text',)
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Запрос', max_length=200)
+    group = forms.ModelChoiceField(
+        Group.objects.all(),
+        label='Группа',
+        required=False,
+        to_field_name='slug',
+    )
+    # Список всех авторов был бы слишком длинным, поэтому имя вводится.
+    author = forms.CharField(label='Автор', max_length=150, required=False)
+
+    def clean_author(self):
+        username = self.cleaned_data['author']
+        if not username:
+            return None
+        try:
+            return User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise forms.ValidationError('Автор не найден')
@@ -0,0 +1,35 @@
+from django.core.cache import caches
+from django.shortcuts import get_object_or_404
+
+from .models import Group, User
+
+GROUP_KEY = 'group:{}'
+
+
+def get_group_or_404(slug):
+    """Группа по адресу из кэша часто читаемых объектов."""
+    key = GROUP_KEY.format(slug)
+    group = caches['hot'].get(key)
+    if group is None:
+        group = get_object_or_404(Group, slug=slug)
+        caches['hot'].set(key, group)
+    return group
+
+
+def forget_group(group):
+    caches['hot'].delete(GROUP_KEY.format(group.slug))
+
+
+AUTHOR_KEY = 'author_id:{}'
+
+
+def get_author_id(username):
+    """id пользователя по имени из кэша или None, если его нет."""
+    key = AUTHOR_KEY.format(username)
+    author_id = caches['hot'].get(key)
+    if author_id is None:
+        author_id = User.objects.filter(
+            username=username).values_list('pk', flat=True).first()
+        if author_id is not None:
+            caches['hot'].set(key, author_id)
+    return author_id
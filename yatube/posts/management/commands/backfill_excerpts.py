@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.excerpts import backfill
+
+
+class Command(BaseCommand):
+    help = 'Заполняет начало текста и HTML постов, где их ещё нет.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересчитать у всех постов, например после смены длины.')
+
+    def handle(self, *args, **options):
+        done = backfill(options['batch_size'], everything=options['all'])
+        self.stdout.write(self.style.SUCCESS(f'Обработано постов: {done}'))
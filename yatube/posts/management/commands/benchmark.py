@@ -0,0 +1,127 @@
+import json
+import platform
+from datetime import datetime, timezone
+from io import StringIO
+
+import django
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from posts import benchmark
+from posts.models import Comment, Follow, Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет БД синтетическими данными и замеряет задержку, число '
+        'запросов и размер ответа маршрутов posts.urls.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок одного пользователя.')
+        parser.add_argument(
+            '--alpha', type=float, default=1.0,
+            help='Показатель степенного закона популярности авторов.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--random-seed', type=int, default=0)
+        parser.add_argument(
+            '--no-seed', action='store_true',
+            help='Замерять на уже заполненной БД.')
+        parser.add_argument(
+            '--flush', action='store_true',
+            help='Удалить данные прошлых прогонов перед заполнением.')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--output', help='Файл для результатов в JSON.')
+        parser.add_argument(
+            '--baseline', help='Результаты прошлого прогона для сравнения.')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимый рост задержки и размера ответа, доля.')
+
+    def log(self, message):
+        if self.verbosity > 1:
+            self.stdout.write(message)
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        if options['flush']:
+            benchmark.flush()
+        if not options['no_seed']:
+            if User.objects.filter(
+                username__startswith=benchmark.USERNAME_PREFIX
+            ).exists():
+                raise CommandError(
+                    'Синтетические данные уже есть: запустите с --flush '
+                    'или --no-seed.')
+            benchmark.seed(
+                options['users'], options['posts'], options['groups'],
+                options['comments'], options['follows'],
+                alpha=options['alpha'],
+                batch_size=options['batch_size'],
+                random_seed=options['random_seed'],
+                log=self.log,
+            )
+            # bulk_create обходит сигналы: счётчики и поиск догоняем здесь.
+            out = self.stdout if self.verbosity > 1 else StringIO()
+            call_command(
+                'reconcile_counters', batch_size=options['batch_size'],
+                stdout=out)
+            call_command(
+                'rebuild_search_index', chunk_size=options['batch_size'],
+                stdout=out)
+        for alias in ('default', 'hot'):
+            caches[alias].clear()
+
+        # Отладочная панель не должна попадать в замеры, а тестовому
+        # клиенту нужен свой хост.
+        with override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver']):
+            results = benchmark.run(options['iterations'], options['warmup'])
+        report = {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+            },
+            'dataset': {
+                'posts': Post.objects.count(),
+                'users': User.objects.count(),
+                'follows': Follow.objects.count(),
+                'comments': Comment.objects.count(),
+            },
+            'iterations': options['iterations'],
+            'routes': results,
+        }
+        self.print_table(results)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as baseline:
+                regressions = benchmark.compare(
+                    results, json.load(baseline), options['threshold'])
+            if regressions:
+                raise CommandError(
+                    'Регрессии:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
+
+    def print_table(self, results):
+        self.stdout.write(
+            f'{"маршрут":<28}{"p50":>9}{"p95":>9}{"p99":>9}'
+            f'{"запросы":>9}{"байты":>9}')
+        for row in results:
+            name = f'{row["route"]} ({row["user"]})'
+            self.stdout.write(
+                f'{name:<28}{row["p50_ms"]:>9.2f}{row["p95_ms"]:>9.2f}'
+                f'{row["p99_ms"]:>9.2f}{row["queries"]:>9}{row["bytes"]:>9}')
@@ -0,0 +1,56 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts.models import Comment, Follow, Group, Post
+from posts.paginators import NEXT, CursorPaginator
+from posts.timeline import TimelinePaginator, get_feed
+from posts.views import DISPLAYED_POSTS
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Печатает план выполнения запросов всех лент.'
+
+    def handle(self, *args, **options):
+        user = User.objects.order_by('pk').first()
+        group = Group.objects.order_by('pk').first()
+        post = Post.objects.order_by('pk').first()
+        user_id = user.pk if user else 0
+        feeds = {
+            'index': Post.objects.all(),
+            'group_list': Post.objects.filter(
+                group_id=group.pk if group else 0),
+            'profile': Post.objects.filter(author_id=user_id),
+            'follow_index': get_feed(user or User(pk=0)),
+            'comments': Comment.objects.filter(
+                post_id=post.pk if post else 0),
+        }
+        for name, queryset in feeds.items():
+            if name == 'follow_index':
+                # Страница ленты выбирается по таблице ленты.
+                paginator = TimelinePaginator(
+                    queryset, DISPLAYED_POSTS, user=user or User(pk=0))
+            else:
+                paginator = CursorPaginator(queryset, DISPLAYED_POSTS)
+            self.explain(name, paginator.page_query())
+            last = queryset.order_by(*paginator.ordering).first()
+            if last is not None:
+                cursor = paginator.encode(NEXT, last)
+                self.explain(f'{name} (cursor)', paginator.page_query(cursor))
+        self.explain('following', Follow.objects.filter(
+            user_id=user_id, author_id=user_id))
+
+    def explain(self, name, queryset):
+        sql, params = queryset.query.sql_with_params()
+        prefix = (
+            'EXPLAIN QUERY PLAN' if connection.vendor == 'sqlite'
+            else 'EXPLAIN'
+        )
+        self.stdout.write(self.style.MIGRATE_HEADING(name))
+        self.stdout.write(sql % tuple(repr(param) for param in params))
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            for row in cursor.fetchall():
+                self.stdout.write('  ' + ' '.join(str(col) for col in row))
@@ -0,0 +1,51 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает группы, пользователей, посты, комментарии и подписки '
+        'в NDJSON (с суффиксом .gz - сжатый).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл выгрузки: *.ndjson[.gz].')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument(
+            '--media', help='Каталог, куда копируются картинки постов.')
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки, по умолчанию <path>.checkpoint.')
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Продолжить с контрольной точки прошлого запуска.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+        state = None
+        if options['resume']:
+            state = transfer.read_checkpoint(checkpoint)
+            if state:
+                self.stdout.write(
+                    f'Продолжение с {state["model"]} после '
+                    f'id {state["last_pk"]}')
+        media = options['media']
+        counts, missing = transfer.export(
+            path,
+            chunk_size=options['chunk_size'],
+            state=state,
+            media=transfer.DirectoryStorage(media) if media else None,
+            on_chunk=lambda state: transfer.write_checkpoint(
+                checkpoint, state),
+        )
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        for label, count in counts.items():
+            self.stdout.write(f'{label}: {count}')
+        if missing:
+            self.stderr.write(f'Не найдено картинок: {missing}')
+        self.stdout.write(self.style.SUCCESS(f'Выгрузка записана в {path}'))
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры картинок уже опубликованных постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересоздать миниатюры и у постов, где они уже есть.')
+        parser.add_argument(
+            '--workers', type=int, default=settings.POST_THUMBNAIL_WORKERS,
+            help='Число потоков; 0 - создавать в текущем потоке.')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        done = thumbnails.backfill(
+            everything=options['all'],
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            on_batch=lambda done: self.stdout.write(
+                f'Обработано постов: {done}'),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюры созданы для {done} постов'))
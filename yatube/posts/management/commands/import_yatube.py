@@ -0,0 +1,69 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает выгрузку export_yatube пачками bulk_create и '
+        'пересчитывает счётчики, ленты подписок, поисковый индекс и '
+        'миниатюры.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл выгрузки: *.ndjson[.gz].')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--media', help='Каталог, откуда копируются картинки постов.')
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки, по умолчанию <path>.checkpoint.')
+        parser.add_argument(
+            '--resume', action='store_true',
+            help=(
+                'Продолжить с контрольной точки прошлого запуска; '
+                'совпадающие с базой записи пропускаются.'))
+        parser.add_argument(
+            '--skip-derived', action='store_true',
+            help=(
+                'Не пересчитывать счётчики, ленты, индекс и миниатюры '
+                'после загрузки.'))
+
+    def handle(self, *args, **options):
+        path = options['path']
+        checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+        skip = 0
+        if options['resume']:
+            state = transfer.read_checkpoint(checkpoint)
+            if state:
+                skip = state['line']
+                self.stdout.write(f'Продолжение после записи {skip}')
+        media = options['media']
+        try:
+            counts, missing = transfer.load(
+                path,
+                batch_size=options['batch_size'],
+                skip=skip,
+                media=transfer.DirectoryStorage(media) if media else None,
+                on_batch=lambda line: transfer.write_checkpoint(
+                    checkpoint, {'line': line}),
+                resume=options['resume'],
+            )
+        except transfer.TransferError as error:
+            raise CommandError(error)
+        for label, count in counts.items():
+            self.stdout.write(f'{label}: {count}')
+        if missing:
+            self.stderr.write(f'Не найдено картинок: {missing}')
+        if options['skip_derived']:
+            self.stdout.write(
+                'Счётчики, ленты подписок, поисковый индекс и миниатюры '
+                'не пересчитаны.')
+        else:
+            done = transfer.finalize(options['batch_size'])
+            self.stdout.write(f'Миниатюры созданы для {done} постов')
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(f'Выгрузка {path} загружена'))
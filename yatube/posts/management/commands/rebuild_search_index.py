@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.search import get_index, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс постов и комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        index = get_index()
+        with transaction.atomic():
+            rebuild(index, options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс перестроен: {type(index).__name__}'))
@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import reconcile_posts, reconcile_users
+from posts.management.utils import batches
+from posts.models import Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        size = options['batch_size']
+        users = posts = 0
+        for ids in batches(User.objects.all(), size):
+            with transaction.atomic():
+                reconcile_users(ids)
+            users += len(ids)
+        for ids in batches(Post.objects.all(), size):
+            with transaction.atomic():
+                reconcile_posts(ids)
+            posts += len(ids)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано пользователей: {users}, постов: {posts}'))
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+CHECKPOINT_MODES = ('passive', 'full', 'restart', 'truncate')
+
+
+class Command(BaseCommand):
+    help = (
+        'Обслуживание SQLite: переносит журнал WAL в файл БД и обновляет '
+        'статистику планировщика (PRAGMA optimize). Запускается по cron '
+        'или с --interval как отдельный процесс.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument(
+            '--mode', choices=CHECKPOINT_MODES, default='truncate',
+            help='Режим wal_checkpoint; truncate ещё и обнуляет файл -wal.')
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Повторять каждые N секунд; 0 - выполнить один раз.')
+
+    def run_once(self, connection, mode):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA wal_checkpoint({mode.upper()})')
+            busy, log, checkpointed = cursor.fetchone()
+            cursor.execute('PRAGMA optimize')
+        if busy:
+            self.stderr.write(
+                'Контрольная точка не завершена: БД занята писателем')
+        self.stdout.write(
+            f'Страниц в журнале: {log}, перенесено: {checkpointed}')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда обслуживает только SQLite')
+        while True:
+            self.run_once(connection, options['mode'])
+            if not options['interval']:
+                return
+            # Соединение не держится открытым между запусками.
+            connection.close()
+            time.sleep(options['interval'])
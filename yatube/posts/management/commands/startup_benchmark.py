@@ -0,0 +1,92 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Выполняется в отдельном интерпретаторе: импорты и первый запрос
+# замеряются в холодном процессе.
+CHILD = '''
+import json, os, sys, time
+
+timings = {}
+started = time.perf_counter()
+os.environ['DJANGO_SETTINGS_MODULE'] = 'yatube.settings'
+os.environ['YATUBE_WARMUP'] = '0'
+
+import django
+from django.conf import settings
+settings.DEBUG = False
+django.setup()
+timings['django.setup'] = time.perf_counter() - started
+
+phase = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+timings['wsgi_application'] = time.perf_counter() - phase
+
+if sys.argv[2] == 'warm':
+    from core import warmup
+    for name, value in warmup.run().items():
+        timings['warmup.' + name] = value
+
+from django.test import Client
+client = Client(HTTP_HOST=(settings.ALLOWED_HOSTS or ['localhost'])[0])
+for label in ('first_request', 'second_request'):
+    phase = time.perf_counter()
+    status = client.get(sys.argv[1]).status_code
+    timings[label] = time.perf_counter() - phase
+timings['total'] = time.perf_counter() - started
+print(json.dumps({'status': status, 'timings': timings}))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Время запуска воркера по фазам: импорты, прогрев и первый '
+        'запрос, с прогревом и без него.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/')
+        parser.add_argument('--runs', type=int, default=3)
+        parser.add_argument('--output', help='Файл для результатов в JSON.')
+
+    def run_child(self, path, mode):
+        completed = subprocess.run(
+            [sys.executable, '-c', CHILD, path, mode],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            env={**os.environ, 'PYTHONPATH': settings.BASE_DIR},
+        )
+        if completed.returncode:
+            raise CommandError(completed.stderr)
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        report = {}
+        for mode in ('cold', 'warm'):
+            runs = [
+                self.run_child(options['path'], mode)
+                for _ in range(options['runs'])
+            ]
+            phases = runs[0]['timings']
+            report[mode] = {
+                'status': runs[-1]['status'],
+                'median_ms': {
+                    name: round(statistics.median(
+                        run['timings'][name] for run in runs) * 1000, 2)
+                    for name in phases
+                },
+            }
+        for mode, result in report.items():
+            self.stdout.write(f'{mode} (HTTP {result["status"]}):')
+            for name, value in result['median_ms'].items():
+                self.stdout.write(f'  {name:<22}{value:>10.2f} мс')
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, indent=2)
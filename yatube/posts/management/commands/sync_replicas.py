@@ -0,0 +1,45 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует файл SQLite primary в файлы реплик из DATABASE_REPLICAS. '
+        'Для локальной проверки маршрутизации чтений; с --interval '
+        'реплики отстают от primary не больше чем на интервал.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Повторять каждые N секунд; 0 - выполнить один раз.')
+
+    def sync(self):
+        primary = connections['default']
+        primary.ensure_connection()
+        for alias in settings.DATABASE_REPLICAS:
+            started = time.perf_counter()
+            target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+            try:
+                # Backup API копирует согласованный снимок даже во время
+                # записи в primary, в отличие от копирования файла.
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(
+                f'{alias}: {(time.perf_counter() - started) * 1000:.1f} мс')
+
+    def handle(self, *args, **options):
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError('Команда копирует только файлы SQLite')
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не заданы: YATUBE_DB_REPLICAS')
+        while True:
+            self.sync()
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from posts import warming
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогревает кэши первыми страницами главной, страницами групп и '
+        'профилями самых пишущих авторов и выводит долю попаданий. '
+        'Имеет смысл для общего кэша (YATUBE_CACHE); локальный кэш '
+        'процесса прогревается при загрузке (YATUBE_WARM_CACHE=1).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--index-pages', type=int,
+            default=settings.WARM_CACHE_INDEX_PAGES)
+        parser.add_argument(
+            '--authors', type=int, default=settings.WARM_CACHE_AUTHORS,
+            help='Сколько профилей авторов с наибольшим числом постов.')
+        parser.add_argument(
+            '--workers', type=int, default=settings.WARM_CACHE_WORKERS)
+        parser.add_argument(
+            '--budget', type=float, default=settings.WARM_CACHE_BUDGET,
+            help='Сколько секунд можно потратить на прогрев.')
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Запросить страницы повторно и вывести попадания.')
+
+    def handle(self, *args, **options):
+        urls = warming.targets(options['index_pages'], options['authors'])
+        # Отладочная панель только замедлила бы прогрев.
+        with override_settings(DEBUG=False):
+            self.report('Прогрев', warming.warm(
+                urls, options['workers'], options['budget']))
+            if options['check']:
+                self.report('Проверка', warming.warm(
+                    urls, options['workers'], options['budget']))
+
+    def report(self, title, result):
+        statuses = ', '.join(
+            f'{status}: {count}'
+            for status, count in sorted(result['statuses'].items()))
+        pages = ', '.join(
+            f'{outcome}: {count}'
+            for outcome, count in sorted(result['pages'].items()))
+        self.stdout.write(
+            f'{title}: {result["requested"]} страниц за '
+            f'{result["seconds"]:.1f} с, пропущено {result["skipped"]}; '
+            f'ответы {statuses or "-"}; готовые страницы {pages or "-"}')
+        if not settings.METRICS_ENABLED:
+            self.stdout.write('Чтения кэша не учитываются: METRICS_ENABLED')
+            return
+        self.stdout.write(
+            f'{"префикс":<32}{"попадания":>10}{"промахи":>10}{"доля":>8}')
+        for prefix, (hits, misses) in result['cache'].items():
+            ratio = hits / (hits + misses) if hits + misses else 0
+            self.stdout.write(
+                f'{prefix:<32}{hits:>10.0f}{misses:>10.0f}{ratio:>8.0%}')
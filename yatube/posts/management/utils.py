@@ -0,0 +1,12 @@
+def batches(queryset, size):
+    """Идентификаторы записей пачками по возрастанию первичного ключа."""
+    last = None
+    while True:
+        page = queryset.order_by('pk')
+        if last is not None:
+            page = page.filter(pk__gt=last)
+        ids = list(page.values_list('pk', flat=True)[:size])
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
@@ -0,0 +1,46 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+BATCH_SIZE = 1000
+
+
+def fill_excerpts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    length = getattr(settings, 'POST_EXCERPT_LENGTH', 300)
+    last = 0
+    while True:
+        batch = list(
+            Post.objects.filter(pk__gt=last).order_by('pk').only('text')
+            [:BATCH_SIZE])
+        if not batch:
+            return
+        for post in batch:
+            post.excerpt = Truncator(post.text).chars(length)
+            post.text_html = linebreaks(post.text, autoescape=True)
+        Post.objects.bulk_update(batch, ['excerpt', 'text_html'])
+        last = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False, verbose_name='Начало текста'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='Текст в HTML'),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
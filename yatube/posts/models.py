@@ -5,6 +5,26 @@ from django.contrib.auth import get_user_model
 User = get_user_model()
 
 
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        """
+        Посты для лент: автор и группа загружаются тем же запросом, полный
+        текст не загружается - карточка выводит excerpt.
+        """
+        return self.select_related('author', 'group').defer(
+            'text', 'text_html')
+
+    def detail(self):
+        """Пост для отдельной страницы вместе со счётчиками автора."""
+        return self.select_related('author__stats', 'group')
+
+
+class CommentQuerySet(models.QuerySet):
+    def thread(self):
+        """Комментарии к посту вместе с их авторами."""
+        return self.select_related('author')
+
+
 class Group(models.Model):
     title = models.CharField(max_length=200, verbose_name='Название')
     slug = models.SlugField(
@@ -48,12 +68,66 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    thumbnail_url = models.CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        verbose_name='Миниатюра для лент',
+    )
+    thumbnail_width = models.PositiveIntegerField(
+        null=True,
+        editable=False,
+        verbose_name='Ширина миниатюры',
+    )
+    thumbnail_height = models.PositiveIntegerField(
+        null=True,
+        editable=False,
+        verbose_name='Высота миниатюры',
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число комментариев',
+    )
+    # Заполняются при сохранении (posts/excerpts.py): ленты выводят
+    # начало текста и не загружают text.
+    excerpt = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='Начало текста',
+    )
+    text_html = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='Текст в HTML',
+    )
+    # Версия карточки поста в кэше: меняется при каждом сохранении.
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text[:15]
 
     class Meta:
         ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_feed_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_feed_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_feed_idx',
+            ),
+        ]
 
 
 class Comment(models.Model):
@@ -78,11 +152,19 @@ class Comment(models.Model):
         verbose_name='Дата комментирования',
     )
 
+    objects = CommentQuerySet.as_manager()
+
     def __str__(self):
         return self.text[:15]
 
     class Meta:
         ordering = ['-created', '-id']
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx',
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -98,3 +180,82 @@ class Follow(models.Model):
         related_name='following',
         verbose_name='На кого подписываются',
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_follow',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx',
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Пост в ленте подписок читателя, записанный при публикации."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    # Копия даты поста: лента сортируется и листается по этой таблице.
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx',
+            ),
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_date_idx',
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, обновляемые при изменении данных."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число постов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписчиков',
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписок',
+    )
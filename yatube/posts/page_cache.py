@@ -0,0 +1,124 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from .feed_cache import (
+    INDEX_FEED, comments_feed, follow_feed, followers_feed, get_generation,
+    group_feed, profile_feed)
+from .lookups import get_author_id, get_group_or_404
+
+PAGE_KEY = 'page:{}'
+LOCK_KEY = 'page_lock:{}'
+# Как часто ждущий запрос проверяет, собрана ли страница.
+POLL_INTERVAL = 0.05
+
+
+def _serve(request, entry, state):
+    response = entry['response']
+    response['X-Page-Cache'] = state
+    return get_conditional_response(
+        request,
+        etag=response.get('ETag'),
+        last_modified=parse_http_date_safe(response.get('Last-Modified')),
+        response=response,
+    )
+
+
+def _store(key, response, version):
+    # Ответы с cookie (например, CSRF) не должны достаться другим.
+    if (response.status_code != 200 or response.streaming
+            or response.cookies):
+        return
+    cache.set(
+        key,
+        {
+            'version': version,
+            'fresh_until': time.time() + settings.PAGE_CACHE_TIMEOUT,
+            'response': response,
+        },
+        settings.PAGE_CACHE_TIMEOUT + settings.PAGE_CACHE_STALE,
+    )
+
+
+def _wait(key):
+    """Ждёт, пока страницу соберёт держатель блокировки."""
+    deadline = time.monotonic() + settings.PAGE_CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def page_cache(feeds):
+    """
+    Кэш готовых страниц для анонимных посетителей.
+
+    Запись помечена версией: PAGE_VERSION и поколениями лент, которые
+    возвращает feeds(request, *args, **kwargs). Устаревшую по времени или
+    по версии страницу пересобирает один запрос, взявший блокировку в
+    кэше; остальные в это время получают прежнюю версию, а при пустом
+    кэше ждут до PAGE_CACHE_LOCK_WAIT секунд.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (not settings.PAGE_CACHE_ENABLED
+                    or request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated):
+                return view(request, *args, **kwargs)
+            found = feeds(request, *args, **kwargs)
+            if found is None:
+                return view(request, *args, **kwargs)
+            version = f'{settings.PAGE_VERSION}:{get_generation(*found)}'
+            digest = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            key = PAGE_KEY.format(digest)
+            entry = cache.get(key)
+            if (entry is not None and entry['version'] == version
+                    and entry['fresh_until'] > time.time()):
+                return _serve(request, entry, 'hit')
+            lock = LOCK_KEY.format(digest)
+            if cache.add(lock, True, settings.PAGE_CACHE_LOCK_TIMEOUT):
+                try:
+                    response = view(request, *args, **kwargs)
+                    _store(key, response, version)
+                finally:
+                    cache.delete(lock)
+                response['X-Page-Cache'] = 'miss'
+                return response
+            entry = entry or _wait(key)
+            if entry is not None:
+                return _serve(request, entry, 'stale')
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def index_feeds(request):
+    return [INDEX_FEED]
+
+
+def group_feeds(request, slug):
+    return [group_feed(get_group_or_404(slug).pk)]
+
+
+def profile_feeds(request, username):
+    author_id = get_author_id(username)
+    if author_id is None:
+        return None
+    return [
+        profile_feed(author_id),
+        follow_feed(author_id),
+        followers_feed(author_id),
+    ]
+
+
+def post_feeds(request, post_id):
+    # Любое сохранение поста меняет поколение главной ленты.
+    return [INDEX_FEED, comments_feed(post_id)]
@@ -0,0 +1,228 @@
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .feed_cache import get_generation
+
+NEXT = 'n'
+PREVIOUS = 'p'
+COUNT_KEY = 'feed_count:{}'
+
+
+class CursorPaginator(Paginator):
+    """
+    Постраничный вывод по ключу сортировки (keyset) вместо OFFSET.
+
+    Страница выбирается условием на поля сортировки относительно
+    непрозрачного курсора, поэтому COUNT(*) не нужен, а любая страница
+    стоит столько же, сколько первая.
+    """
+    cursor_mode = True
+
+    def __init__(self, object_list, per_page, ordering=None):
+        super().__init__(object_list, per_page)
+        self.ordering = tuple(
+            ordering
+            or object_list.query.order_by
+            or object_list.model._meta.ordering
+        )
+        self.has_next = False
+        self.has_previous = False
+
+    @property
+    def num_pages(self):
+        """Известны только соседние страницы, общее число не считается."""
+        return 1 + self.has_previous + self.has_next
+
+    def get_page(self, cursor):
+        """Возвращает страницу по курсору, при ошибке - первую."""
+        direction, values = self._parse(cursor)
+        rows = self._rows(direction, values)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction is not None and not rows:
+            return self.get_page(None)
+        if direction == PREVIOUS:
+            rows.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous = direction == NEXT
+            self.has_next = has_more
+        page = self._get_page(rows, 1 + self.has_previous, self)
+        page.next_cursor = (
+            self.encode(NEXT, rows[-1]) if self.has_next else None
+        )
+        page.previous_cursor = (
+            self.encode(PREVIOUS, rows[0]) if self.has_previous else None
+        )
+        return page
+
+    def page_query(self, cursor=None):
+        """Запрос одной страницы, например, для EXPLAIN."""
+        return self._query(*self._parse(cursor))[:self.per_page + 1]
+
+    def encode(self, direction, row):
+        """Курсор на позицию строки (объекта или словаря из values())."""
+        values = [self._dump(self._value(row, name)) for name in self._fields]
+        data = json.dumps([direction, values]).encode()
+        return urlsafe_base64_encode(data)
+
+    def decode(self, cursor):
+        if not cursor:
+            return None, None
+        direction, values = json.loads(urlsafe_base64_decode(cursor))
+        if direction not in (NEXT, PREVIOUS):
+            raise ValueError('Unknown cursor direction')
+        if (not isinstance(values, list)
+                or len(values) != len(self._fields)):
+            raise ValueError('Cursor does not match ordering')
+        # Сравнение с NULL в условии страницы невозможно.
+        if not all(isinstance(value, (str, int, float))
+                   and not isinstance(value, bool) for value in values):
+            raise ValueError('Cursor values must be scalars')
+        values = [
+            self._to_python(name, value)
+            for name, value in zip(self._fields, values)
+        ]
+        if None in values:
+            raise ValueError('Cursor values must not be empty')
+        return direction, values
+
+    def _to_python(self, name, value):
+        return self.object_list.model._meta.get_field(name).to_python(value)
+
+    def _parse(self, cursor):
+        try:
+            return self.decode(cursor)
+        except (TypeError, ValueError, ValidationError):
+            return None, None
+
+    def _rows(self, direction, values):
+        """Строки страницы и ещё одна, если есть следующая."""
+        return list(self._query(direction, values)[:self.per_page + 1])
+
+    def _query(self, direction, values):
+        if direction is None:
+            return self.object_list.order_by(*self.ordering)
+        reverse = direction == PREVIOUS
+        return self.object_list.filter(
+            self._after(values, reverse)
+        ).order_by(*self._directed(reverse))
+
+    @property
+    def _fields(self):
+        pk_name = self.object_list.model._meta.pk.name
+        return [
+            pk_name if name.lstrip('-') == 'pk' else name.lstrip('-')
+            for name in self.ordering
+        ]
+
+    def _directed(self, reverse):
+        if not reverse:
+            return self.ordering
+        return tuple(
+            name[1:] if name.startswith('-') else f'-{name}'
+            for name in self.ordering
+        )
+
+    def _after(self, values, reverse):
+        """Строки, идущие после курсора в порядке сортировки."""
+        condition = Q()
+        equal = Q()
+        for name, field, value in zip(self.ordering, self._fields, values):
+            descending = name.startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+        return condition
+
+    @staticmethod
+    def _value(row, name):
+        if isinstance(row, dict):
+            return row[name]
+        return getattr(row, name)
+
+    @staticmethod
+    def _dump(value):
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return value
+
+
+class FeedPaginator(Paginator):
+    """
+    Постраничный вывод по номерам страниц без COUNT(*) на каждый запрос.
+
+    Число постов берётся из поддерживаемого счётчика (total) или из кэша
+    по поколению лент feeds. Ленту не длиннее PAGINATOR_EXACT_COUNT
+    пересчитывают после каждого изменения, длинную - не чаще раза в
+    PAGINATOR_COUNT_TIMEOUT секунд, до этого число приблизительное.
+    Ссылки выводятся только на первую, последнюю и соседние страницы.
+    """
+    cursor_mode = False
+
+    def __init__(self, object_list, per_page, feeds=(), total=None):
+        super().__init__(object_list, per_page)
+        self.feeds = tuple(feeds)
+        self.total = total
+        self.approximate = False
+
+    @cached_property
+    def count(self):
+        if self.total is not None:
+            return self.total
+        if not self.feeds:
+            return self.object_list.count()
+        key = COUNT_KEY.format('.'.join(self.feeds))
+        generation = get_generation(*self.feeds)
+        cached = cache.get(key)
+        if cached is not None:
+            counted, total = cached
+            if counted == generation:
+                return total
+            if total > settings.PAGINATOR_EXACT_COUNT:
+                self.approximate = True
+                return total
+        total = self.object_list.count()
+        cache.set(
+            key, (generation, total), settings.PAGINATOR_COUNT_TIMEOUT)
+        return total
+
+    def window(self, number):
+        """
+        Номера страниц для ссылок, None - пропуск.
+
+        Первая, последняя и по PAGINATOR_WINDOW страниц с обеих сторон
+        от текущей.
+        """
+        around = settings.PAGINATOR_WINDOW
+        pages = sorted({
+            1,
+            self.num_pages,
+            *range(
+                max(1, number - around),
+                min(self.num_pages, number + around) + 1,
+            ),
+        })
+        result = []
+        previous = 0
+        for page in pages:
+            # Вместо пропуска одной страницы выводится она сама.
+            if page - previous == 2:
+                result.append(previous + 1)
+            elif page - previous > 2:
+                result.append(None)
+            result.append(page)
+            previous = page
+        return result
+
+    def _get_page(self, *args, **kwargs):
+        page = super()._get_page(*args, **kwargs)
+        page.window = self.window(page.number)
+        return page
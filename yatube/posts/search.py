@@ -0,0 +1,317 @@
+import math
+import re
+import threading
+from collections import defaultdict
+
+from django.db import connection
+
+from .models import Comment, Post
+from .paginators import NEXT, PREVIOUS, CursorPaginator
+
+POST_TABLE = 'posts_post_fts'
+COMMENT_TABLE = 'posts_comment_fts'
+# Совпадение в комментарии весит меньше совпадения в тексте поста.
+COMMENT_WEIGHT = 0.5
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def fts5_available():
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        options = {row[0] for row in cursor.fetchall()}
+    return 'ENABLE_FTS5' in options
+
+
+class Fts5Index:
+    """Полнотекстовый индекс на виртуальных таблицах SQLite FTS5."""
+
+    def index_post(self, post_id, text):
+        self._replace(POST_TABLE, post_id, text)
+
+    def remove_post(self, post_id):
+        self._delete(POST_TABLE, post_id)
+
+    def index_comment(self, comment_id, post_id, text):
+        self._replace(COMMENT_TABLE, comment_id, text, post_id)
+
+    def remove_comment(self, comment_id):
+        self._delete(COMMENT_TABLE, comment_id)
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {POST_TABLE}')
+            cursor.execute(f'DELETE FROM {COMMENT_TABLE}')
+
+    def add_posts(self, rows):
+        """Пачка пар (id, текст) для перестроения индекса."""
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {POST_TABLE} (rowid, text) VALUES (%s, %s)',
+                rows,
+            )
+
+    def add_comments(self, rows):
+        """Пачка троек (id, id поста, текст) для перестроения индекса."""
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {COMMENT_TABLE} (rowid, post_id, text) '
+                f'VALUES (%s, %s, %s)',
+                rows,
+            )
+
+    def search(self, terms, direction=None, position=None, limit=10,
+               group_id=None, author_id=None):
+        """
+        Пары (ранг, id поста) по возрастанию ранга, меньший ранг лучше.
+
+        direction и position задают ключ, после (NEXT) или до (PREVIOUS)
+        которого нужны результаты; для PREVIOUS порядок обратный.
+        """
+        match = ' '.join(f'"{term}"' for term in terms)
+        params = [match, COMMENT_WEIGHT, match]
+        where = []
+        if group_id is not None:
+            where.append('posts_post.group_id = %s')
+            params.append(group_id)
+        if author_id is not None:
+            where.append('posts_post.author_id = %s')
+            params.append(author_id)
+        having = ''
+        order = 'ASC'
+        if direction is not None:
+            operator = '>' if direction == NEXT else '<'
+            order = 'ASC' if direction == NEXT else 'DESC'
+            rank, post_id = position
+            having = (
+                f'HAVING rank {operator} %s '
+                f'OR (rank = %s AND post_id {operator} %s)'
+            )
+            params += [rank, rank, post_id]
+        params.append(limit)
+        sql = f'''
+            SELECT matches.post_id, MIN(matches.weight) AS rank
+            FROM (
+                SELECT rowid AS post_id, bm25({POST_TABLE}) AS weight
+                FROM {POST_TABLE} WHERE {POST_TABLE} MATCH %s
+                UNION ALL
+                SELECT post_id, bm25({COMMENT_TABLE}) * %s AS weight
+                FROM {COMMENT_TABLE} WHERE {COMMENT_TABLE} MATCH %s
+            ) AS matches
+            JOIN posts_post ON posts_post.id = matches.post_id
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            GROUP BY matches.post_id
+            {having}
+            ORDER BY rank {order}, matches.post_id {order}
+            LIMIT %s
+        '''
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [(rank, post_id) for post_id, rank in cursor.fetchall()]
+
+    def _replace(self, table, rowid, text, post_id=None):
+        self._delete(table, rowid)
+        with connection.cursor() as cursor:
+            if post_id is None:
+                cursor.execute(
+                    f'INSERT INTO {table} (rowid, text) VALUES (%s, %s)',
+                    [rowid, text],
+                )
+            else:
+                cursor.execute(
+                    f'INSERT INTO {table} (rowid, post_id, text) '
+                    f'VALUES (%s, %s, %s)',
+                    [rowid, post_id, text],
+                )
+
+    def _delete(self, table, rowid):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', [rowid])
+
+
+class MemoryIndex:
+    """
+    Инвертированный индекс в памяти процесса для БД без FTS5.
+
+    Строится при первом поиске и дальше обновляется сигналами этого же
+    процесса, поэтому изменения из других воркеров видны только после
+    перестроения.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._postings = defaultdict(dict)
+            self._documents = {}
+
+    def index_post(self, post_id, text):
+        self._replace(('post', post_id), post_id, text, 1.0)
+
+    def remove_post(self, post_id):
+        self._remove(('post', post_id))
+
+    def index_comment(self, comment_id, post_id, text):
+        self._replace(('comment', comment_id), post_id, text, COMMENT_WEIGHT)
+
+    def remove_comment(self, comment_id):
+        self._remove(('comment', comment_id))
+
+    def add_posts(self, rows):
+        for post_id, text in rows:
+            self.index_post(post_id, text)
+
+    def add_comments(self, rows):
+        for comment_id, post_id, text in rows:
+            self.index_comment(comment_id, post_id, text)
+
+    def search(self, terms, direction=None, position=None, limit=10,
+               group_id=None, author_id=None):
+        self._ensure_built()
+        with self._lock:
+            scores = None
+            for term in terms:
+                postings = self._postings.get(term, {})
+                idf = math.log(1 + len(self._documents) / (1 + len(postings)))
+                term_scores = defaultdict(float)
+                for key, frequency in postings.items():
+                    post_id, weight, _ = self._documents[key]
+                    term_scores[post_id] += frequency * weight * idf
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {
+                        post_id: score + term_scores[post_id]
+                        for post_id, score in scores.items()
+                        if post_id in term_scores
+                    }
+        hits = sorted((-score, post_id) for post_id, score in scores.items())
+        if direction == NEXT:
+            hits = [hit for hit in hits if hit > tuple(position)]
+        elif direction == PREVIOUS:
+            hits = [hit for hit in reversed(hits) if hit < tuple(position)]
+        if group_id is not None or author_id is not None:
+            hits = self._filter(hits, limit, group_id, author_id)
+        return hits[:limit]
+
+    def _filter(self, hits, limit, group_id, author_id):
+        filters = {}
+        if group_id is not None:
+            filters['group_id'] = group_id
+        if author_id is not None:
+            filters['author_id'] = author_id
+        found = []
+        for start in range(0, len(hits), limit * 4):
+            chunk = hits[start:start + limit * 4]
+            allowed = set(Post.objects.filter(
+                pk__in=[post_id for _, post_id in chunk], **filters
+            ).values_list('pk', flat=True))
+            found += [hit for hit in chunk if hit[1] in allowed]
+            if len(found) >= limit:
+                break
+        return found
+
+    def _replace(self, key, post_id, text, weight):
+        frequencies = defaultdict(int)
+        for term in tokenize(text):
+            frequencies[term] += 1
+        with self._lock:
+            self._remove(key)
+            self._documents[key] = (post_id, weight, list(frequencies))
+            for term, frequency in frequencies.items():
+                self._postings[term][key] = frequency
+
+    def _remove(self, key):
+        with self._lock:
+            document = self._documents.pop(key, None)
+            if document is None:
+                return
+            for term in document[2]:
+                postings = self._postings[term]
+                postings.pop(key, None)
+                if not postings:
+                    del self._postings[term]
+
+    def _ensure_built(self):
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    rebuild(self)
+                    self._built = True
+
+
+def rebuild(index, chunk_size=2000):
+    """Перестраивает индекс, читая посты и комментарии пачками."""
+    index.clear()
+    posts = Post.objects.order_by().values_list('pk', 'text')
+    _stream(posts.iterator(chunk_size=chunk_size), index.add_posts, chunk_size)
+    comments = Comment.objects.order_by().values_list('pk', 'post_id', 'text')
+    _stream(
+        comments.iterator(chunk_size=chunk_size),
+        index.add_comments,
+        chunk_size,
+    )
+
+
+def _stream(rows, add, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            add(chunk)
+            chunk = []
+    if chunk:
+        add(chunk)
+
+
+_index = None
+
+
+def get_index():
+    global _index
+    if _index is None:
+        tables = connection.introspection.table_names()
+        if POST_TABLE in tables and fts5_available():
+            _index = Fts5Index()
+        else:
+            _index = MemoryIndex()
+    return _index
+
+
+class SearchPaginator(CursorPaginator):
+    """Курсоры по рангу и id поста для результатов поиска."""
+
+    def __init__(self, query, per_page, group_id=None, author_id=None,
+                 index=None):
+        super().__init__(Post.objects.feed(), per_page, ('rank', 'id'))
+        self.terms = tokenize(query)
+        self.group_id = group_id
+        self.author_id = author_id
+        self.index = index or get_index()
+
+    def _query(self, direction, values):
+        if not self.terms:
+            return []
+        hits = self.index.search(
+            self.terms, direction, values, self.per_page + 1,
+            group_id=self.group_id, author_id=self.author_id,
+        )
+        posts = self.object_list.in_bulk([post_id for _, post_id in hits])
+        rows = []
+        for rank, post_id in hits:
+            post = posts.get(post_id)
+            if post is not None:
+                post.rank = rank
+                rows.append(post)
+        return rows
+
+    def _to_python(self, name, value):
+        return float(value) if name == 'rank' else int(value)
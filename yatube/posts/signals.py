@@ -0,0 +1,94 @@
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_delete, pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import counters, excerpts, search, timeline
+from .feed_cache import (
+    INDEX_FEED, bump, bump_post, comments_feed, follow_feed, followers_feed,
+    group_feed)
+from .lookups import forget_group
+from .models import Comment, Follow, Group, Post
+
+
+@receiver(post_init, sender=Post)
+def post_loaded(sender, instance, **kwargs):
+    # Группа на момент загрузки: при смене группы устаревают обе ленты.
+    instance._loaded_group_id = instance.__dict__.get('group_id')
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, **kwargs):
+    # Без загруженного текста (ленты его откладывают) excerpt не меняется.
+    if 'text' not in instance.get_deferred_fields():
+        excerpts.fill(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.increment(instance.author_id, 'posts_count')
+        timeline.fan_out_post(instance)
+    search.get_index().index_post(instance.pk, instance.text)
+    bump_post(instance)
+    instance._loaded_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.decrement(instance.author_id, 'posts_count')
+    search.get_index().remove_post(instance.pk)
+    bump_post(instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    bump(INDEX_FEED, group_feed(instance.pk))
+    forget_group(instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_touched(sender, instance, **kwargs):
+    # Название группы есть в карточках её постов: новая версия постов
+    # делает их карточки в кэше устаревшими.
+    Post.objects.filter(group_id=instance.pk).update(
+        updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_comments(instance.post_id, 1)
+    search.get_index().index_comment(
+        instance.pk, instance.post_id, instance.text)
+    bump(comments_feed(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_comments(instance.post_id, -1)
+    search.get_index().remove_comment(instance.pk)
+    bump(comments_feed(instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.increment(instance.author_id, 'followers_count')
+        counters.increment(instance.user_id, 'following_count')
+        timeline.add_author(instance.user_id, instance.author_id)
+        bump(
+            follow_feed(instance.user_id),
+            followers_feed(instance.author_id),
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    followers = counters.decrement_value(
+        instance.author_id, 'followers_count')
+    counters.decrement(instance.user_id, 'following_count')
+    timeline.remove_author(instance.user_id, instance.author_id, followers)
+    bump(follow_feed(instance.user_id), followers_feed(instance.author_id))
@@ -0,0 +1,200 @@
+import hashlib
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.http import http_date
+from django.utils.text import Truncator
+from django.utils.xmlutils import SimplerXMLGenerator
+
+from core.routers import replica_reads
+
+from .feed_cache import INDEX_FEED, get_state, group_feed, profile_feed
+from .lookups import get_group_or_404
+from .models import Post, User
+
+# Сколько последних постов попадает в ленту и какими пачками они читаются.
+FEED_ITEMS = 50
+FEED_CHUNK_SIZE = 20
+# В ленте абсолютные ссылки, поэтому ключ включает и хост.
+FEED_KEY = 'syndication:{}:{}:{}:{}'
+
+
+class StreamingFeedMixin:
+    """
+    Лента, которая пишется по мере чтения постов.
+
+    Стандартный write() требует все элементы заранее, stream() отдаёт
+    заголовок, затем каждый элемент отдельным куском.
+    """
+
+    item_element = None
+
+    def __init__(self, *args, latest=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latest = latest
+
+    def latest_post_date(self):
+        return self.latest or super().latest_post_date()
+
+    def stream(self, items):
+        output = StringIO()
+        handler = SimplerXMLGenerator(output, settings.DEFAULT_CHARSET)
+
+        def flush():
+            chunk = output.getvalue().encode(settings.DEFAULT_CHARSET)
+            output.seek(0)
+            output.truncate()
+            return chunk
+
+        handler.startDocument()
+        self.open_root(handler)
+        yield flush()
+        for item in items:
+            # add_item() заполняет значения по умолчанию.
+            self.add_item(**item)
+            item = self.items.pop()
+            handler.startElement(
+                self.item_element, self.item_attributes(item))
+            self.add_item_elements(handler, item)
+            handler.endElement(self.item_element)
+            yield flush()
+        self.close_root(handler)
+        yield flush()
+
+
+class StreamingRssFeed(StreamingFeedMixin, Rss201rev2Feed):
+    item_element = 'item'
+
+    def open_root(self, handler):
+        handler.startElement('rss', self.rss_attributes())
+        handler.startElement('channel', self.root_attributes())
+        self.add_root_elements(handler)
+
+    def close_root(self, handler):
+        self.endChannelElement(handler)
+        handler.endElement('rss')
+
+
+class StreamingAtomFeed(StreamingFeedMixin, Atom1Feed):
+    item_element = 'entry'
+
+    def open_root(self, handler):
+        handler.startElement('feed', self.root_attributes())
+        self.add_root_elements(handler)
+
+    def close_root(self, handler):
+        handler.endElement('feed')
+
+
+FORMATS = {
+    'rss': StreamingRssFeed,
+    'atom': StreamingAtomFeed,
+}
+
+
+def _items(request, queryset):
+    # В ленте RSS нужен полный текст, который feed() откладывает.
+    posts = queryset.feed().defer(None)[:FEED_ITEMS]
+    for post in posts.iterator(chunk_size=FEED_CHUNK_SIZE):
+        link = request.build_absolute_uri(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        yield {
+            'title': Truncator(post.text).words(8),
+            'link': link,
+            'description': post.text,
+            'author_name': post.author.get_full_name() or post.author.username,
+            'pubdate': post.pub_date,
+            'unique_id': link,
+            'categories': [post.group.title] if post.group_id else [],
+        }
+
+
+def _caching(chunks, key):
+    """Отдаёт куски ответа и кэширует ленту, если она дописана до конца."""
+    written = []
+    for chunk in chunks:
+        written.append(chunk)
+        yield chunk
+    cache.set(key, b''.join(written), settings.FEED_CACHE_TIMEOUT)
+
+
+def syndication(request, feed_format, feed, queryset, title, link,
+                description):
+    """Ответ с лентой: 304, готовая лента из кэша или потоковая запись."""
+    feed_class = FORMATS.get(feed_format)
+    if feed_class is None:
+        raise Http404
+    newest = queryset.aggregate(newest=Max('pub_date'))['newest']
+    generation, changed = get_state(feed)
+    newest_timestamp = newest.timestamp() if newest else 0
+    last_modified = int(max(changed, newest_timestamp))
+    etag = quote_etag(hashlib.md5(
+        f'{settings.PAGE_VERSION}:{feed_format}:{generation}:'
+        f'{newest_timestamp}'.encode()
+    ).hexdigest())
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is None:
+        content_type = feed_class.content_type
+        key = FEED_KEY.format(
+            feed_format, feed, request.get_host(), generation)
+        content = cache.get(key)
+        if content is not None:
+            response = HttpResponse(content, content_type=content_type)
+        else:
+            writer = feed_class(
+                title=title,
+                link=request.build_absolute_uri(link),
+                description=description,
+                feed_url=request.build_absolute_uri(),
+                language='ru',
+                latest=newest,
+            )
+            response = StreamingHttpResponse(
+                _caching(writer.stream(_items(request, queryset)), key),
+                content_type=content_type,
+            )
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+@replica_reads
+def index_feed(request, feed_format):
+    return syndication(
+        request, feed_format, INDEX_FEED, Post.objects.all(),
+        title='Yatube: последние обновления',
+        link=reverse('posts:index'),
+        description='Последние записи всех авторов',
+    )
+
+
+@replica_reads
+def group_posts_feed(request, slug, feed_format):
+    group = get_group_or_404(slug)
+    return syndication(
+        request, feed_format, group_feed(group.pk),
+        Post.objects.filter(group_id=group.pk),
+        title=f'Yatube: {group.title}',
+        link=reverse('posts:group_list', kwargs={'slug': slug}),
+        description=group.description,
+    )
+
+
+@replica_reads
+def profile_posts_feed(request, username, feed_format):
+    author = get_object_or_404(User, username=username)
+    return syndication(
+        request, feed_format, profile_feed(author.pk),
+        Post.objects.filter(author_id=author.pk),
+        title=f'Yatube: {author.get_full_name() or author.username}',
+        link=reverse('posts:profile', kwargs={'username': username}),
+        description=f'Записи пользователя {author.username}',
+    )
@@ -0,0 +1,284 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .. import transfer, warming
+from ..feed_cache import INDEX_FEED, get_generation, profile_feed
+from ..models import (
+    Comment, Follow, Group, Post, TimelineEntry, UserStats)
+
+User = get_user_model()
+
+
+class CommandsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def test_explain_feeds(self):
+        """План запросов лент использует составные индексы."""
+        out = StringIO()
+        call_command('explain_feeds', stdout=out)
+        output = out.getvalue()
+        for index in ('post_feed_idx', 'post_group_feed_idx',
+                      'post_author_feed_idx', 'comment_post_created_idx'):
+            with self.subTest(index=index):
+                self.assertIn(index, output)
+
+    def test_reconcile_counters(self):
+        """Пересчёт восстанавливает рассинхронизированные счётчики."""
+        Comment.objects.create(post=self.post, author=self.user, text='Да')
+        UserStats.objects.all().delete()
+        Post.objects.update(comments_count=0)
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+        stats = UserStats.objects.get(user=self.author)
+        self.assertEqual(stats.posts_count, 1)
+        self.assertEqual(stats.followers_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.user).following_count, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_generate_thumbnails(self):
+        """Миниатюры создаются для постов, у которых их ещё нет."""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x00\x00\x00\x21\xf9\x04'
+            b'\x01\x0a\x00\x01\x00\x2c\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02'
+            b'\x02\x4c\x01\x00\x3b'
+        )
+        with override_settings(MEDIA_ROOT=media_root):
+            post = Post.objects.create(
+                author=self.author,
+                text='Пост с картинкой',
+                image=SimpleUploadedFile('small.gif', small_gif),
+            )
+            call_command('generate_thumbnails', workers=0, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnail_url)
+        self.assertEqual(post.thumbnail_width, 400)
+
+    def test_benchmark(self):
+        """Бенчмарк заполняет БД, пишет JSON и находит регрессии."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        output = os.path.join(directory, 'run.json')
+        call_command(
+            'benchmark', users=20, posts=60, groups=2, comments=30,
+            follows=3, iterations=2, warmup=0, output=output,
+            stdout=StringIO(),
+        )
+        self.assertEqual(
+            Post.objects.filter(author__username__startswith='bench_').count(),
+            60,
+        )
+        self.assertTrue(TimelineEntry.objects.exists())
+        with open(output, encoding='utf-8') as run:
+            report = json.load(run)
+        routes = {row['route'] for row in report['routes']}
+        self.assertIn('index', routes)
+        self.assertIn('search', routes)
+        self.assertNotIn('profile_follow', routes)
+        for row in report['routes']:
+            for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'queries', 'bytes'):
+                self.assertIn(metric, row)
+
+        for row in report['routes']:
+            row['p50_ms'] = row['p95_ms'] = 0
+            row['queries'] = 0
+        with open(output, 'w', encoding='utf-8') as run:
+            json.dump(report, run)
+        with self.assertRaises(CommandError):
+            call_command(
+                'benchmark', no_seed=True, iterations=1, warmup=0,
+                baseline=output, stdout=StringIO(),
+            )
+
+    def test_backfill_excerpts(self):
+        """Начало текста заполняется у постов, созданных в обход save()."""
+        Post.objects.bulk_create([
+            Post(author=self.author, text='Без начала') for _ in range(3)])
+        feeds = (INDEX_FEED, profile_feed(self.author.pk))
+        generation = get_generation(*feeds)
+        started = timezone.now()
+        call_command('backfill_excerpts', batch_size=2, stdout=StringIO())
+        self.assertFalse(Post.objects.filter(excerpt='').exists())
+        self.assertEqual(
+            Post.objects.filter(
+                excerpt='Без начала', updated_at__gte=started).count(), 3)
+        self.assertNotEqual(get_generation(*feeds), generation)
+
+    def test_export_import(self):
+        """Выгрузка переносит данные, даты и картинки постов."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        media_root = os.path.join(directory, 'media')
+        media = os.path.join(directory, 'export-media')
+        path = os.path.join(directory, 'dump.ndjson.gz')
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x00\x00\x00\x21\xf9\x04'
+            b'\x01\x0a\x00\x01\x00\x2c\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02'
+            b'\x02\x4c\x01\x00\x3b'
+        )
+        with override_settings(
+                MEDIA_ROOT=media_root, POST_THUMBNAIL_WORKERS=0):
+            post = Post.objects.create(
+                author=self.author,
+                text='Пост с картинкой',
+                image=SimpleUploadedFile('small.gif', small_gif),
+            )
+            Comment.objects.create(post=post, author=self.user, text='Да')
+            call_command(
+                'export_yatube', path, chunk_size=1, media=media,
+                stdout=StringIO())
+            self.assertFalse(os.path.exists(f'{path}.checkpoint'))
+            with gzip.open(path, 'rt', encoding='utf-8') as dump:
+                self.assertEqual(len(dump.readlines()), 8)
+            pub_date = post.pub_date
+            image = post.image.name
+            shutil.rmtree(media_root)
+            for model in (Follow, Comment, Post, Group, User):
+                model.objects.all().delete()
+
+            call_command(
+                'import_yatube', path, batch_size=2, media=media,
+                stdout=StringIO())
+            imported = Post.objects.get(pk=post.pk)
+            self.assertEqual(imported.pub_date, pub_date)
+            self.assertEqual(imported.image.name, image)
+            self.assertTrue(os.path.exists(imported.image.path))
+        self.assertEqual(imported.thumbnail_width, 400)
+        self.assertEqual(imported.comments_count, 1)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.user).count(), 2)
+
+    def test_export_resume(self):
+        """Прерванная выгрузка продолжается с контрольной точки."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        full = os.path.join(directory, 'full.ndjson')
+        path = os.path.join(directory, 'dump.ndjson')
+        call_command('export_yatube', full, stdout=StringIO())
+
+        def interrupt(state):
+            transfer.write_checkpoint(f'{path}.checkpoint', state)
+            if state['model'] == 'auth.user':
+                raise KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            transfer.export(path, chunk_size=1, on_chunk=interrupt)
+        call_command('export_yatube', path, resume=True, stdout=StringIO())
+        with open(full, encoding='utf-8') as expected:
+            with open(path, encoding='utf-8') as resumed:
+                self.assertEqual(resumed.read(), expected.read())
+
+    def test_import_resume(self):
+        """Загрузка пропускает записи до контрольной точки."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'dump.ndjson')
+        call_command('export_yatube', path, stdout=StringIO())
+        Follow.objects.all().delete()
+        # Первая запись - группа, её пропускаем, и правка не мешает.
+        Group.objects.update(title='Другая группа')
+        transfer.write_checkpoint(f'{path}.checkpoint', {'line': 1})
+        out = StringIO()
+        call_command(
+            'import_yatube', path, resume=True, skip_derived=True,
+            stdout=out)
+        self.assertEqual(Group.objects.get().title, 'Другая группа')
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertIn('posts.post: 0', out.getvalue())
+        with open(os.path.join(directory, 'bad.ndjson'), 'w') as bad:
+            bad.write('{}\n')
+        with self.assertRaises(CommandError):
+            call_command('import_yatube', bad.name, stdout=StringIO())
+
+    def test_import_conflicts(self):
+        """Загрузка не заменяет молча строки, которые уже есть в базе."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'dump.ndjson')
+        call_command('export_yatube', path, stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, 'только в пустую базу'):
+            call_command('import_yatube', path, stdout=StringIO())
+        Follow.objects.all().delete()
+        mallory = User.objects.create_user(username='mallory')
+        Post.objects.filter(author=self.author).update(author=mallory)
+        with self.assertRaisesMessage(CommandError, 'отличается: author'):
+            call_command(
+                'import_yatube', path, resume=True, skip_derived=True,
+                stdout=StringIO())
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(Post.objects.filter(author=self.author).exists())
+
+
+class SqliteMaintenanceTests(TransactionTestCase):
+    # PRAGMA optimize не выполняется внутри транзакции TestCase.
+    def test_sqlite_maintenance(self):
+        """Обслуживание SQLite выполняет контрольную точку журнала."""
+        out = StringIO()
+        call_command('sqlite_maintenance', mode='passive', stdout=out)
+        self.assertIn('Страниц в журнале', out.getvalue())
+
+
+class WarmCacheTests(TransactionTestCase):
+    # Страницы запрашиваются из потоков со своими соединениями, им нужны
+    # зафиксированные данные.
+    def setUp(self):
+        for alias in ('default', 'hot'):
+            caches[alias].clear()
+        author = User.objects.create_user(username='author')
+        group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug')
+        for number in range(12):
+            Post.objects.create(
+                author=author, text=f'Пост {number}', group=group)
+
+    def test_warm_cache(self):
+        """Прогрев запрашивает главную, группы и профили авторов."""
+        urls = warming.targets(index_pages=5, authors=1)
+        self.assertEqual(len(urls), 4)
+        self.assertIn('?cursor=', urls[1])
+        out = StringIO()
+        call_command(
+            'warm_cache', index_pages=5, authors=1, workers=2, check=True,
+            stdout=out)
+        first, check = out.getvalue().split('Проверка')
+        self.assertIn('4 страниц', first)
+        self.assertIn('miss: 4', first)
+        self.assertIn('hit: 4', check)
+        self.assertIn('page', check)
+
+    def test_warm_cache_budget(self):
+        """Страницы после исчерпания бюджета пропускаются."""
+        result = warming.warm(warming.targets(1, 1), budget=-1)
+        self.assertEqual(result['requested'], 0)
+        self.assertEqual(result['skipped'], 3)
@@ -140,3 +140,18 @@ class PostsFormsTests(TestCase):
             follow=True,
         )
         self.assertEqual(Comment.objects.latest('id').id, 1)
+
+    @override_settings(POST_THUMBNAIL_WORKERS=0)
+    def test_create_form_thumbnail(self):
+        """Миниатюра для лент создаётся при сохранении картинки."""
+        self.authorized_test_user.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': self.uploaded_image},
+        )
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertTrue(post.thumbnail_url)
+        self.assertEqual(
+            (post.thumbnail_width, post.thumbnail_height), (400, 400))
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id}))
+        self.assertContains(response, post.thumbnail_url)
@@ -1,7 +1,8 @@
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
 
-from ..models import Group, Post
+from ..models import Comment, Follow, Group, Post, UserStats
 
 User = get_user_model()
 
@@ -65,3 +66,48 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     post._meta.get_field(field).help_text, value)
+
+    def test_follow_unique(self):
+        """Повторная подписка на автора запрещена на уровне БД."""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=PostModelTest.user)
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(user=reader, author=PostModelTest.user)
+
+    def test_counters(self):
+        """Счётчики обновляются при создании и удалении записей."""
+        reader = User.objects.create_user(username='reader')
+        post = Post.objects.create(author=reader, text='Пост читателя')
+        comment = Comment.objects.create(
+            post=post, author=PostModelTest.user, text='Комментарий')
+        Follow.objects.create(user=reader, author=PostModelTest.user)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        stats = UserStats.objects.get(user=reader)
+        self.assertEqual(
+            (stats.posts_count, stats.followers_count, stats.following_count),
+            (1, 0, 1),
+        )
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        post.delete()
+        Follow.objects.filter(user=reader).delete()
+        stats.refresh_from_db()
+        self.assertEqual(
+            (stats.posts_count, stats.followers_count, stats.following_count),
+            (0, 0, 0),
+        )
+
+    @override_settings(POST_EXCERPT_LENGTH=10)
+    def test_excerpt(self):
+        """Начало текста и HTML пересчитываются при сохранении."""
+        post = Post.objects.create(
+            author=PostModelTest.user, text='Длинный <текст>\nпоста')
+        self.assertEqual(post.excerpt, 'Длинный <…')
+        self.assertEqual(
+            post.text_html, '<p>Длинный &lt;текст&gt;<br>поста</p>')
+        post.text = 'Коротко'
+        post.save()
+        self.assertEqual(
+            Post.objects.get(pk=post.pk).excerpt, 'Коротко')
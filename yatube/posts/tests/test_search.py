@@ -0,0 +1,112 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+from ..search import Fts5Index, MemoryIndex, SearchPaginator, get_index
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.best = Post.objects.create(
+            author=cls.author,
+            group=cls.group,
+            text='Кактус, кактус и ещё раз кактус',
+        )
+        cls.plain = Post.objects.create(
+            author=cls.other,
+            text='Просто кактус на окне',
+        )
+        cls.commented = Post.objects.create(
+            author=cls.other,
+            text='Пост без нужного слова',
+        )
+        Comment.objects.create(
+            post=cls.commented, author=cls.author, text='А где кактус?')
+        Post.objects.create(author=cls.author, text='Совсем другое')
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, **params):
+        response = self.client.get(reverse('posts:search'), params)
+        return list(response.context['page_obj'])
+
+    def test_search_ranks_posts_and_comments(self):
+        """Находятся посты и комментарии, лучшие совпадения первыми."""
+        self.assertIsInstance(get_index(), Fts5Index)
+        self.assertEqual(
+            self.search(q='КАКТУС'),
+            [self.best, self.plain, self.commented],
+        )
+
+    def test_search_filters(self):
+        """Результаты фильтруются по группе и автору."""
+        self.assertEqual(
+            self.search(q='кактус', group=self.group.slug), [self.best])
+        self.assertEqual(
+            self.search(q='кактус', author=self.other.username),
+            [self.plain, self.commented],
+        )
+
+    def test_search_follows_changes(self):
+        """Индекс обновляется при правке и удалении постов."""
+        post = Post.objects.get(pk=self.plain.pk)
+        post.text = 'Теперь про фикус'
+        post.save()
+        Post.objects.get(pk=self.best.pk).delete()
+        self.assertEqual(self.search(q='кактус'), [self.commented])
+        self.assertEqual(self.search(q='фикус'), [self.plain])
+
+    def test_search_cursor(self):
+        """Курсоры проходят результаты поиска без повторов."""
+        for index in (get_index(), MemoryIndex()):
+            with self.subTest(index=type(index).__name__):
+                paginator = SearchPaginator('кактус', 2, index=index)
+                first = paginator.get_page(None)
+                second = paginator.get_page(first.next_cursor)
+                back = paginator.get_page(second.previous_cursor)
+                self.assertEqual(
+                    list(first) + list(second),
+                    [self.best, self.plain, self.commented],
+                )
+                self.assertEqual(list(back), list(first))
+                self.assertFalse(second.has_next())
+
+    def test_memory_index_filters(self):
+        """Индекс в памяти учитывает фильтры по группе и автору."""
+        index = MemoryIndex()
+        paginator = SearchPaginator(
+            'кактус', 10, author_id=self.other.pk, index=index)
+        self.assertEqual(
+            list(paginator.get_page(None)), [self.plain, self.commented])
+
+    def test_search_rebuild(self):
+        """Команда перестроения восстанавливает индекс целиком."""
+        get_index().clear()
+        self.assertEqual(self.search(q='кактус'), [])
+        call_command('rebuild_search_index', chunk_size=1, stdout=StringIO())
+        self.assertEqual(len(self.search(q='кактус')), 3)
+
+    def test_search_without_query(self):
+        """Без запроса показывается только форма."""
+        response = self.client.get(reverse('posts:search'))
+        self.assertIsNone(response.context['page_obj'])
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'кактус', 'author': 'nobody'})
+        self.assertIsNone(response.context['page_obj'])
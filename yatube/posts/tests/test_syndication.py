@@ -0,0 +1,103 @@
+from xml.etree import ElementTree
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..syndication import FEED_ITEMS
+
+User = get_user_model()
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+class SyndicationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(FEED_ITEMS + 5):
+            Post.objects.create(
+                author=cls.author if i % 2 else cls.other,
+                text=f'Пост номер {i}',
+                group=cls.group if i % 3 == 0 else None,
+            )
+
+    def setUp(self):
+        cache.clear()
+        caches['hot'].clear()
+
+    def urls(self, feed_format):
+        return {
+            'index': reverse('posts:index_feed', args=[feed_format]),
+            'group': reverse(
+                'posts:group_feed', args=[self.group.slug, feed_format]),
+            'profile': reverse(
+                'posts:profile_feed',
+                args=[self.author.username, feed_format],
+            ),
+        }
+
+    def read(self, url, **headers):
+        response = self.client.get(url, **headers)
+        if response.streaming:
+            return response, b''.join(response.streaming_content)
+        return response, response.content
+
+    def test_feeds_stream_latest_posts(self):
+        """Ленты содержат последние посты своей выборки."""
+        expected = {
+            'index': Post.objects.all(),
+            'group': Post.objects.filter(group=self.group),
+            'profile': Post.objects.filter(author=self.author),
+        }
+        for name, url in self.urls('rss').items():
+            with self.subTest(feed=name):
+                response, content = self.read(url)
+                self.assertTrue(response.streaming)
+                self.assertIn('application/rss+xml', response['Content-Type'])
+                items = ElementTree.fromstring(content).iter('item')
+                descriptions = [
+                    item.find('description').text for item in items]
+                self.assertEqual(descriptions, [
+                    post.text for post in expected[name][:FEED_ITEMS]])
+
+    def test_atom(self):
+        response, content = self.read(self.urls('atom')['index'])
+        self.assertIn('application/atom+xml', response['Content-Type'])
+        entries = list(ElementTree.fromstring(content).iter(f'{ATOM}entry'))
+        self.assertEqual(len(entries), FEED_ITEMS)
+
+    def test_cached_until_posts_change(self):
+        """Готовая лента берётся из кэша, новый пост её сбрасывает."""
+        url = self.urls('rss')['index']
+        _, content = self.read(url)
+        with self.assertNumQueries(1):
+            response, cached = self.read(url)
+        self.assertFalse(response.streaming)
+        self.assertEqual(cached, content)
+        Post.objects.create(author=self.author, text='Совсем новый пост')
+        response, content = self.read(url)
+        self.assertTrue(response.streaming)
+        self.assertIn('Совсем новый пост'.encode(), content)
+
+    def test_if_modified_since(self):
+        """Неизменившаяся лента отдаётся ответом 304."""
+        for name, url in self.urls('atom').items():
+            with self.subTest(feed=name):
+                response, _ = self.read(url)
+                response = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(response.status_code, 304)
+
+    def test_unknown_format(self):
+        for url in self.urls('json').values():
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
@@ -0,0 +1,88 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry
+from ..timeline import get_feed
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки',
+        )
+
+    def test_fan_out_on_write(self):
+        """Подписка и новый пост попадают в ленту читателя."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2)
+        self.assertEqual(list(get_feed(self.reader)),
+                         [new_post, self.old_post])
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertFalse(get_feed(self.reader).exists())
+
+    @override_settings(TIMELINE_CELEBRITY_FOLLOWERS=1)
+    def test_celebrity_fan_out_on_read(self):
+        """Посты популярного автора читаются без раскладки по лентам."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(list(get_feed(self.reader)),
+                         [new_post, self.old_post])
+
+    @override_settings(TIMELINE_CELEBRITY_FOLLOWERS=3)
+    def test_celebrity_demoted_by_batch_delete(self):
+        """Отписка пачкой раскладывает посты бывшего популярного автора."""
+        readers = [self.reader] + [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(2)
+        ]
+        for reader in readers:
+            Follow.objects.create(user=reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(TimelineEntry.objects.filter(post=new_post).exists())
+        with mock.patch.object(timeline, 'schedule_refill') as schedule:
+            Follow.objects.filter(user__in=readers[1:]).delete()
+        schedule.assert_called_once_with(self.author.pk)
+        timeline.refill(self.author.pk)
+        self.assertEqual(list(get_feed(self.reader)),
+                         [new_post, self.old_post])
+
+    @override_settings(TIMELINE_CELEBRITY_FOLLOWERS=2)
+    def test_timeline_paginator(self):
+        """Страницы ленты сливают разложенные посты и посты популярных."""
+        celebrity = User.objects.create_user(username='celebrity')
+        fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=celebrity)
+        Follow.objects.create(user=fan, author=celebrity)
+        for number in range(3):
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+            Post.objects.create(author=celebrity, text=f'Звезда {number}')
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 4)
+        entry = TimelineEntry.objects.filter(user=self.reader).first()
+        self.assertEqual(entry.pub_date, entry.post.pub_date)
+        expected = list(get_feed(self.reader))
+        self.assertEqual(len(expected), 7)
+        paginator = timeline.TimelinePaginator(
+            get_feed(self.reader), 3, user=self.reader)
+        pages = [paginator.get_page(None)]
+        while pages[-1].next_cursor:
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        self.assertEqual(
+            [post for page in pages for post in page], expected)
+        previous = paginator.get_page(pages[-1].previous_cursor)
+        self.assertEqual(list(previous), expected[3:6])
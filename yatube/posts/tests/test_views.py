@@ -1,19 +1,36 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
 from django.forms import fields
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.core.paginator import Page
 from django.urls import reverse
+from django.utils.http import urlsafe_base64_encode
+from django.utils.module_loading import import_string
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.core.cache import cache
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from unittest import mock
 
-from .. models import Follow, Group, Post
+from .. import cards, excerpts, page_cache
+from .. models import Comment, Follow, Group, Post
 from .. forms import PostForm
-from .. views import DISPLAYED_POSTS
+from .. paginators import FeedPaginator
+from .. views import DISPLAYED_COMMENTS, DISPLAYED_POSTS
 
 
 User = get_user_model()
 
 
+# Рендер страниц проверяется без кэша готовых страниц.
+@override_settings(PAGE_CACHE_ENABLED=False)
 class PostsPagesTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -55,6 +72,9 @@ class PostsPagesTests(TestCase):
                     group=cls.group_1,
                 )
             )
+        # bulk_create обходит сигналы, начало текста заполняется отдельно.
+        for post in cls.posts_list:
+            excerpts.fill(post)
         Post.objects.bulk_create(cls.posts_list)
         cls.posts_list.append(
             Post.objects.create(
@@ -202,6 +222,48 @@ class PostsPagesTests(TestCase):
                         author__username=(
                             self.user_auth.username)).all()[:DISPLAYED_POSTS]
 
+    def test_cursor_paginator(self):
+        """Курсоры index ведут на следующую и предыдущую страницы."""
+        response = self.guest_client.get(reverse('posts:index'))
+        first_page = response.context['page_obj']
+        self.assertFalse(first_page.has_previous())
+        self.assertTrue(first_page.has_next())
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': first_page.next_cursor})
+        second_page = response.context['page_obj']
+        self.assertQuerysetEqual(
+            Post.objects.all()[DISPLAYED_POSTS:], second_page,
+            transform=lambda x: x)
+        self.assertFalse(second_page.has_next())
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': second_page.previous_cursor})
+        self.assertQuerysetEqual(
+            first_page, response.context['page_obj'],
+            transform=lambda x: x)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_cursor_paginator_bad_cursor(self):
+        """Испорченный курсор возвращает первую страницу."""
+        cursors = ['broken'] + [
+            urlsafe_base64_encode(json.dumps(data).encode())
+            for data in (
+                ['n', [None, None]],
+                ['n', ['', '']],
+                ['n', [[1], {'a': 1}]],
+                ['n', 'ab'],
+                ['n', [True, 1]],
+                {'n': 1},
+            )
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                response = self.guest_client.get(
+                    reverse('posts:index'), {'cursor': cursor})
+                self.assertQuerysetEqual(
+                    Post.objects.all()[:DISPLAYED_POSTS],
+                    response.context['page_obj'],
+                    transform=lambda x: x)
+
     def test_create_post_correct_group_and_profile(self):
         """
         Отображение поста в group_list и profile после его создания.
@@ -227,13 +289,82 @@ class PostsPagesTests(TestCase):
         response = self.guest_client.get(reverse('posts:index'))
         first_object = response.context['page_obj'][0]
         Post.objects.get(id=16).delete()
+        # Ленты не загружают полный текст, только его начало.
         self.assertEqual(
-            first_object.text, self.posts_list[15].text)
+            first_object.excerpt, self.posts_list[15].text)
         cache.clear()
         response = self.guest_client.get(reverse('posts:index'))
         first_object = response.context['page_obj'][0]
         self.assertEqual(
-            first_object.text, self.posts_list[14].text)
+            first_object.excerpt, self.posts_list[14].text)
+
+    def test_feed_cache_invalidation(self):
+        """Фрагменты лент сбрасываются сразу после изменения постов."""
+        self.check_feed_cache_invalidation()
+
+    def test_feed_cache_invalidation_shared(self):
+        """Сброс лент работает и с общими для воркеров кэшами."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        # Вместо сервера Redis - fakeredis с тем же протоколом.
+        redis = {'CLIENT_CLASS': 'fakeredis.FakeRedis'}
+        for name, location, options in (
+                ('file', directory, {}),
+                ('db', 'test_cache', {}),
+                ('redis', 'redis://127.0.0.1:6379/14', redis)):
+            backend = settings.CACHE_BACKENDS[name][0]
+            shared = {
+                **settings.CACHES,
+                'default': {
+                    'BACKEND': backend,
+                    'LOCATION': location,
+                    'OPTIONS': options,
+                },
+            }
+            with self.subTest(cache=name), override_settings(CACHES=shared):
+                if name == 'db':
+                    call_command('createcachetable', verbosity=0)
+                self.assertIsInstance(
+                    caches['default'], import_string(backend))
+                caches['default'].clear()
+                self.check_feed_cache_invalidation()
+        self.assertTrue(os.listdir(directory))
+
+    def check_feed_cache_invalidation(self):
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group_2.slug}),
+            reverse('posts:profile', kwargs={
+                'username': self.user_test_user.username}),
+        ]
+        for url in urls:
+            self.guest_client.get(url)
+        post = Post.objects.create(
+            author=self.user_test_user,
+            text='Свежий пост',
+            group=self.group_2,
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, 'Свежий пост')
+        post.text = 'Исправленный пост'
+        post.group = self.group_1
+        post.save()
+        response = self.guest_client.get(urls[1])
+        self.assertNotContains(response, 'Исправленный пост')
+        response = self.guest_client.get(
+            reverse('posts:group_list', kwargs={'slug': self.group_1.slug}))
+        self.assertContains(response, 'Исправленный пост')
+
+    def test_feed_cache_pages(self):
+        """Страницы ленты кэшируются отдельно."""
+        response = self.guest_client.get(reverse('posts:index'))
+        cursor = response.context['page_obj'].next_cursor
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': cursor})
+        self.assertContains(response, 'Пост 1<')
+        self.assertNotContains(response, 'Пост 16')
 
     def test_subscribtions(self):
         """Подписки работают исправно."""
@@ -258,3 +389,482 @@ class PostsPagesTests(TestCase):
         )
         self.assertFalse(
             Follow.objects.filter(user=self.user_test_user_2.id).exists())
+
+
+class QueryBudgetTests(TestCase):
+    """Число запросов страницы не зависит от числа постов на ней."""
+    # Первый запрос index, group_list, profile и post_detail считает
+    # валидаторы условного GET.
+    QUERY_BUDGET = {
+        'posts:index': 2,
+        'posts:group_list': 3,
+        'posts:profile': 4,
+        'posts:post_detail': 3,
+        # Популярные авторы, страница таблицы ленты и её посты.
+        'posts:follow_index': 3,
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(DISPLAYED_POSTS):
+            post = Post.objects.create(
+                author=cls.author,
+                text=f'Пост {i}',
+                group=cls.group,
+            )
+            post.comments.create(author=cls.reader, text=f'Комментарий {i}')
+        post.comments.create(author=cls.author, text='Ответ автора')
+        cls.post = post
+        cls.authorized_reader = Client()
+        cls.authorized_reader.force_login(cls.reader)
+
+    def setUp(self):
+        caches['hot'].clear()
+
+    def test_query_budget(self):
+        """Страницы укладываются в бюджет запросов к БД."""
+        urls = {
+            'posts:index': reverse('posts:index'),
+            'posts:group_list': reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}),
+            'posts:profile': reverse(
+                'posts:profile', kwargs={'username': self.author.username}),
+            'posts:post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.id}),
+            'posts:follow_index': reverse('posts:follow_index'),
+        }
+        for name, url in urls.items():
+            with self.subTest(url=name):
+                # Сессия и пользователь загружаются двумя запросами.
+                with self.assertNumQueries(self.QUERY_BUDGET[name] + 2):
+                    self.authorized_reader.get(url)
+
+
+@override_settings(PAGE_CACHE_ENABLED=False)
+class ConditionalGetTests(TestCase):
+    """Неизменившиеся страницы отдаются ответом 304."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+        cls.urls = {
+            'index': reverse('posts:index'),
+            'group_list': reverse(
+                'posts:group_list', kwargs={'slug': cls.group.slug}),
+            'profile': reverse(
+                'posts:profile', kwargs={'username': cls.author.username}),
+            'post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': cls.post.id}),
+        }
+
+    def setUp(self):
+        cache.clear()
+        caches['hot'].clear()
+
+    def assertNotModified(self, url, client=None):
+        client = client or self.client
+        etag = client.get(url)['ETag']
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        return etag
+
+    def test_not_modified(self):
+        """Повторный запрос без изменений не рендерит страницу."""
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                etag = self.client.get(url)['ETag']
+                # Только запрос валидаторов, без основного запроса.
+                with self.assertNumQueries(1):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.templates, [])
+                self.assertEqual(response['ETag'], etag)
+
+    def test_if_modified_since(self):
+        """Last-Modified тоже позволяет ответить 304."""
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                last_modified = self.client.get(url)['Last-Modified']
+                response = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=last_modified)
+                self.assertEqual(response.status_code, 304)
+
+    def test_changes_modify_pages(self):
+        """Комментарии, подписки и правки меняют ETag своих страниц."""
+        changes = (
+            (('post_detail',), lambda: self.post.comments.create(
+                author=self.reader, text='Комментарий')),
+            (('profile',), lambda: Follow.objects.create(
+                user=self.reader, author=self.author)),
+            (('index', 'group_list', 'profile', 'post_detail'),
+             self.edit_post),
+        )
+        for pages, change in changes:
+            etags = {
+                name: self.assertNotModified(self.urls[name])
+                for name in pages
+            }
+            change()
+            for name in pages:
+                with self.subTest(page=name, change=change):
+                    response = self.client.get(
+                        self.urls[name], HTTP_IF_NONE_MATCH=etags[name])
+                    self.assertEqual(response.status_code, 200)
+
+    def edit_post(self):
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный пост'
+        post.save()
+
+    def test_vary_on_user(self):
+        """Гость и пользователь получают разные ETag."""
+        reader = Client()
+        reader.force_login(self.reader)
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                etag = self.assertNotModified(url)
+                self.assertEqual(
+                    self.client.get(url)['Cache-Control'], 'no-cache, public')
+                response = reader.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    response['Cache-Control'], 'no-cache, private')
+                self.assertNotModified(url, reader)
+
+    def test_missing_pages(self):
+        """Несуществующие страницы по-прежнему отдают 404."""
+        for url in (
+            reverse('posts:profile', kwargs={'username': 'nobody'}),
+            reverse('posts:post_detail', kwargs={'post_id': 1000}),
+            reverse('posts:group_list', kwargs={'slug': 'nothing'}),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class CommentPaginationTests(TestCase):
+    """Комментарии выводятся порциями по курсору."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.author, text=f'Комментарий {i}')
+            for i in range(DISPLAYED_COMMENTS * 2 + 5)
+        )
+        cls.comments = list(cls.post.comments.all())
+        cls.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.id})
+        cls.fragment_url = reverse(
+            'posts:post_comments', kwargs={'post_id': cls.post.id})
+
+    def setUp(self):
+        cache.clear()
+
+    def test_detail_inline_cap(self):
+        """Страница поста выводит не больше DISPLAYED_COMMENTS."""
+        response = self.client.get(self.detail_url)
+        page = response.context['comments']
+        self.assertEqual(list(page), self.comments[:DISPLAYED_COMMENTS])
+        self.assertTrue(page.has_next())
+        response = self.client.get(
+            self.detail_url, {'comments': page.next_cursor})
+        self.assertEqual(
+            list(response.context['comments']),
+            self.comments[DISPLAYED_COMMENTS:DISPLAYED_COMMENTS * 2],
+        )
+
+    def test_fragment_html(self):
+        """Фрагмент отдаёт следующую порцию и ссылку на продолжение."""
+        response = self.client.get(self.fragment_url)
+        self.assertTemplateUsed(response, 'posts/includes/comment_list.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        page = response.context['comments']
+        self.assertContains(response, 'Ещё комментарии')
+        response = self.client.get(
+            self.fragment_url, {'cursor': page.next_cursor})
+        response = self.client.get(
+            self.fragment_url,
+            {'cursor': response.context['comments'].next_cursor},
+        )
+        self.assertEqual(
+            list(response.context['comments']),
+            self.comments[DISPLAYED_COMMENTS * 2:],
+        )
+        self.assertNotContains(response, 'Ещё комментарии')
+
+    def test_fragment_json(self):
+        """Порции в JSON проходят весь список без повторов."""
+        seen = []
+        cursor = None
+        while True:
+            params = {'format': 'json'}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.client.get(self.fragment_url, params).json()
+            seen += [comment['id'] for comment in data['comments']]
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(seen, [comment.pk for comment in self.comments])
+        response = self.client.get(
+            self.fragment_url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    def test_missing_post(self):
+        url = reverse('posts:post_comments', kwargs={'post_id': 1000})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class PostCardCacheTests(TestCase):
+    """Карточки постов кэшируются по отдельности."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'Пост {number}', group=cls.group)
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        caches['hot'].clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def card_reads(self, url):
+        """Сколько раз страница читала карточки из кэша."""
+        with mock.patch.object(
+                cards.cache, 'get_many', wraps=cards.cache.get_many) as read:
+            response = self.client.get(url)
+        calls = [
+            keys for (keys,), _ in read.call_args_list
+            if keys and keys[0].startswith('post_card:')
+        ]
+        return response, calls
+
+    def test_single_get_many(self):
+        """Страница ленты читает все карточки одним get_many."""
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+        ):
+            with self.subTest(url=url):
+                response, calls = self.card_reads(url)
+                self.assertEqual(len(calls), 1)
+                self.assertEqual(len(calls[0]), 3)
+                self.assertContains(response, 'Пост 2')
+
+    def test_feed_defers_text(self):
+        """Ленты не читают полный текст постов."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Пост 2')
+        for query in queries.captured_queries:
+            self.assertNotIn('"posts_post"."text"', query['sql'])
+
+    def test_edit_invalidates_one_card(self):
+        """Правка поста заменяет только его карточку."""
+        self.client.get(reverse('posts:index'))
+        keys = [
+            cards.card_key(Post.objects.get(pk=post.pk))
+            for post in self.posts
+        ]
+        self.assertEqual(len(cache.get_many(keys)), 3)
+        edited = self.posts[0]
+        self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': edited.pk}),
+            {'text': 'Исправленный пост', 'group': self.group.pk},
+        )
+        with mock.patch.object(
+                cards, 'render_to_string',
+                wraps=cards.render_to_string) as rendered:
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Исправленный пост')
+        self.assertEqual(rendered.call_count, 1)
+        self.assertEqual(
+            rendered.call_args[0][1]['post'].pk, edited.pk)
+
+
+class PageCacheTests(TestCase):
+    """Готовые страницы для анонимных посетителей."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Тестовый пост', group=cls.group)
+        cls.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        caches['hot'].clear()
+
+    def lock(self, url):
+        digest = hashlib.md5(url.encode()).hexdigest()
+        return page_cache.LOCK_KEY.format(digest)
+
+    def test_hit_without_queries(self):
+        """Повторный запрос анонима отдаётся из кэша без SQL."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url)['X-Page-Cache'], 'miss')
+                with self.assertNumQueries(0):
+                    response = self.client.get(url)
+                self.assertEqual(response['X-Page-Cache'], 'hit')
+                self.assertContains(response, 'Тестовый пост')
+                etag = response['ETag']
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_authenticated_not_cached(self):
+        """Страницы пользователей в кэш готовых страниц не попадают."""
+        author_client = Client()
+        author_client.force_login(self.author)
+        author_client.get(self.urls[0])
+        response = author_client.get(self.urls[0])
+        self.assertFalse(response.has_header('X-Page-Cache'))
+
+    def test_stale_while_revalidate(self):
+        """Пока страницу пересобирает другой процесс, отдаётся старая."""
+        url = self.urls[0]
+        self.client.get(url)
+        Post.objects.filter(pk=self.post.pk).update(text='Новый текст')
+        Post.objects.get(pk=self.post.pk).save()
+        cache.add(self.lock(url), True)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'stale')
+        self.assertContains(response, 'Тестовый пост')
+        cache.delete(self.lock(url))
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Новый текст')
+
+    @override_settings(PAGE_CACHE_LOCK_WAIT=0)
+    def test_cold_miss_locked(self):
+        """Без готовой страницы и без блокировки страница рисуется сама."""
+        url = self.urls[0]
+        cache.add(self.lock(url), True)
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('X-Page-Cache'))
+        self.assertContains(response, 'Тестовый пост')
+
+
+@override_settings(PAGE_CACHE_ENABLED=False)
+class FeedPaginatorTests(TestCase):
+    """Постраничный вывод по номерам без COUNT(*) на каждый запрос."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        for i in range(DISPLAYED_POSTS * 3 + 1):
+            Post.objects.create(author=cls.author, text=f'Пост {i}')
+
+    def setUp(self):
+        cache.clear()
+        caches['hot'].clear()
+
+    def counts(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'page': 1})
+        counted = sum(
+            'COUNT(' in query['sql'] for query in queries.captured_queries)
+        return response, counted
+
+    def test_window(self):
+        """Ссылки на первую, последнюю и соседние страницы."""
+        paginator = FeedPaginator(
+            Post.objects.none(), DISPLAYED_POSTS, total=500)
+        windows = {
+            1: [1, 2, 3, None, 50],
+            4: [1, 2, 3, 4, 5, 6, None, 50],
+            25: [1, None, 23, 24, 25, 26, 27, None, 50],
+            50: [1, None, 48, 49, 50],
+        }
+        for number, expected in windows.items():
+            with self.subTest(number=number):
+                self.assertEqual(paginator.window(number), expected)
+
+    @override_settings(PAGINATOR_WINDOW=0)
+    def test_window_rendered(self):
+        response = self.client.get(reverse('posts:index'), {'page': 1})
+        self.assertEqual(response.context['page_obj'].window, [1, None, 4])
+        self.assertContains(response, '&hellip;')
+        self.assertContains(response, '?page=4')
+        self.assertNotContains(response, '?page=3"')
+
+    def test_count_cached(self):
+        """Число постов ленты считается заново только после изменений."""
+        url = reverse('posts:index')
+        self.assertEqual(self.counts(url)[1], 1)
+        self.assertEqual(self.counts(url)[1], 0)
+        Post.objects.create(author=self.author, text='Новый пост')
+        response, counted = self.counts(url)
+        self.assertEqual(counted, 1)
+        self.assertEqual(
+            response.context['page_obj'].paginator.count,
+            DISPLAYED_POSTS * 3 + 2)
+
+    @override_settings(PAGINATOR_EXACT_COUNT=DISPLAYED_POSTS)
+    def test_count_approximate(self):
+        """Длинная лента не пересчитывается после каждого изменения."""
+        url = reverse('posts:index')
+        self.counts(url)
+        Post.objects.create(author=self.author, text='Новый пост')
+        response, counted = self.counts(url)
+        self.assertEqual(counted, 0)
+        paginator = response.context['page_obj'].paginator
+        self.assertTrue(paginator.approximate)
+        self.assertEqual(paginator.count, DISPLAYED_POSTS * 3 + 1)
+        self.assertContains(response, '&asymp;4')
+
+    def test_profile_uses_counter(self):
+        """Профиль берёт число постов из счётчика автора."""
+        response, counted = self.counts(
+            reverse('posts:profile', kwargs={'username': 'auth'}))
+        self.assertEqual(counted, 0)
+        self.assertEqual(response.context['page_obj'].paginator.num_pages, 4)
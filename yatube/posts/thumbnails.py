@@ -0,0 +1,102 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from sorl.thumbnail import get_thumbnail
+
+from core import prometheus
+
+from .feed_cache import bump_post
+from .management.utils import batches
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.POST_THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def generate(post_id):
+    """Создаёт все размеры картинки поста и запоминает размер для лент."""
+    try:
+        post = Post.objects.only('image', 'author', 'group').get(pk=post_id)
+        if not post.image:
+            return
+        started = time.perf_counter()
+        feed_thumbnail = get_thumbnail(
+            post.image, settings.POST_THUMBNAIL_SIZE, crop='center')
+        for size in settings.POST_THUMBNAIL_EXTRA_SIZES:
+            get_thumbnail(post.image, size, crop='center')
+        prometheus.observe_thumbnails(time.perf_counter() - started)
+        updated = Post.objects.filter(
+            pk=post_id,
+            image=post.image.name,
+        ).update(
+            thumbnail_url=feed_thumbnail.url,
+            thumbnail_width=feed_thumbnail.width,
+            thumbnail_height=feed_thumbnail.height,
+            updated_at=timezone.now(),
+        )
+        if updated:
+            bump_post(post)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры поста %s', post_id)
+
+
+def generate_in_worker(post_id):
+    """generate() для фонового потока: у потока своё соединение с БД."""
+    try:
+        generate(post_id)
+    finally:
+        connection.close()
+
+
+def schedule(post):
+    """Ставит создание миниатюр в очередь после фиксации транзакции."""
+    if not settings.POST_THUMBNAIL_WORKERS:
+        generate(post.pk)
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(generate_in_worker, post.pk))
+
+
+def backfill(everything=False, batch_size=500, workers=None, on_batch=None):
+    """
+    Создаёт миниатюры уже сохранённых постов пачками.
+
+    Без everything - только у постов, где миниатюр ещё нет. on_batch(done)
+    получает число обработанных постов. Возвращает это число.
+    """
+    posts = Post.objects.exclude(image='')
+    if not everything:
+        posts = posts.filter(thumbnail_url='')
+    if workers is None:
+        workers = settings.POST_THUMBNAIL_WORKERS
+    executor = ThreadPoolExecutor(max_workers=workers) if workers else None
+    done = 0
+    try:
+        for ids in batches(posts, batch_size):
+            if executor:
+                list(executor.map(generate_in_worker, ids))
+            else:
+                for post_id in ids:
+                    generate(post_id)
+            done += len(ids)
+            if on_batch:
+                on_batch(done)
+    finally:
+        if executor:
+            executor.shutdown()
+    return done
@@ -0,0 +1,198 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .feed_cache import bump, follow_feed
+from .management.utils import batches
+from .models import Follow, Post, TimelineEntry, UserStats
+from .paginators import PREVIOUS, CursorPaginator
+
+TIMELINE_ORDERING = ('-pub_date', '-post_id')
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.TIMELINE_WORKERS,
+            thread_name_prefix='timeline',
+        )
+    return _executor
+
+
+def is_celebrity(author_id):
+    """Автор с большим числом подписчиков читается при запросе ленты."""
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gte=settings.TIMELINE_CELEBRITY_FOLLOWERS,
+    ).exists()
+
+
+def _bulk_add(entries):
+    TimelineEntry.objects.bulk_create(
+        entries,
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_post(post):
+    """Добавляет новый пост в ленты всех подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _bulk_add(
+        TimelineEntry(
+            user_id=user_id, post=post, author_id=post.author_id,
+            pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def add_author(user_id, author_id):
+    """Переносит посты автора в ленту нового подписчика."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('id', 'pub_date')
+    _bulk_add(
+        TimelineEntry(
+            user_id=user_id, post_id=post_id, author_id=author_id,
+            pub_date=pub_date)
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def remove_author(user_id, author_id, followers=None):
+    """
+    Убирает посты автора из ленты отписавшегося читателя.
+
+    followers - число подписчиков автора после отписки. Если оно опустилось
+    ниже порога популярности, посты, опубликованные без раскладки,
+    раскладываются по лентам оставшихся подписчиков в фоне.
+    """
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+    threshold = settings.TIMELINE_CELEBRITY_FOLLOWERS
+    if followers is not None and followers < threshold <= followers + 1:
+        schedule_refill(author_id)
+
+
+def refill(author_id):
+    """Раскладывает посты автора по лентам подписчиков пачками."""
+    if is_celebrity(author_id):
+        return
+    posts = list(Post.objects.filter(
+        author_id=author_id
+    ).values_list('id', 'pub_date'))
+    if not posts:
+        return
+    follows = Follow.objects.filter(author_id=author_id)
+    for ids in batches(follows, settings.TIMELINE_BATCH_SIZE):
+        user_ids = list(Follow.objects.filter(
+            pk__in=ids
+        ).values_list('user_id', flat=True))
+        with transaction.atomic():
+            _bulk_add(
+                TimelineEntry(
+                    user_id=user_id, post_id=post_id, author_id=author_id,
+                    pub_date=pub_date)
+                for user_id in user_ids
+                for post_id, pub_date in posts
+            )
+        bump(*(follow_feed(user_id) for user_id in user_ids))
+
+
+def refill_in_worker(author_id):
+    """refill() для фонового потока: у потока своё соединение с БД."""
+    try:
+        refill(author_id)
+    finally:
+        connection.close()
+
+
+def schedule_refill(author_id):
+    """Ставит раскладку в очередь после фиксации транзакции."""
+    if not settings.TIMELINE_WORKERS:
+        transaction.on_commit(lambda: refill(author_id))
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(refill_in_worker, author_id))
+
+
+def celebrities(user):
+    """Популярные авторы, на которых подписан читатель (запрос)."""
+    return Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gte=(
+            settings.TIMELINE_CELEBRITY_FOLLOWERS),
+    ).values_list('author', flat=True)
+
+
+def get_feed(user):
+    """
+    Лента подписок: разложенные посты и посты популярных авторов.
+
+    Запрос ленивый: по курсору ленту листает TimelinePaginator, сам
+    запрос выполняется для страниц по номеру.
+    """
+    return Post.objects.feed().filter(
+        Q(pk__in=TimelineEntry.objects.filter(user=user).values('post'))
+        | Q(author__in=celebrities(user))
+    )
+
+
+class TimelinePaginator(CursorPaginator):
+    """
+    Лента подписок get_feed() по курсору.
+
+    Страница выбирается по индексу (user, -pub_date, -post) таблицы ленты,
+    из постов загружаются только её строки. Посты популярных авторов
+    выбираются по тому же курсору и сливаются со страницей ленты.
+    Сортировка - по убыванию даты и ключа, как у Post.
+    """
+
+    def __init__(self, object_list, per_page, ordering=None, user=None):
+        super().__init__(object_list, per_page, ordering)
+        self.user = user
+        self.entries = CursorPaginator(
+            TimelineEntry.objects.filter(user=user).order_by(
+                *TIMELINE_ORDERING),
+            per_page,
+            TIMELINE_ORDERING,
+        )
+
+    def page_query(self, cursor=None):
+        """Запрос страницы таблицы ленты, например, для EXPLAIN."""
+        return self.entries.page_query(cursor).values('post')
+
+    def _rows(self, direction, values):
+        limit = self.per_page + 1
+        post_ids = list(self.entries._query(
+            direction, values
+        ).values_list('post', flat=True)[:limit])
+        rows = list(self.object_list.filter(pk__in=post_ids))
+        celebrity_ids = list(celebrities(self.user))
+        if celebrity_ids:
+            rows += self._query(direction, values).filter(
+                author__in=celebrity_ids)[:limit]
+        # Пост популярного автора может быть и в таблице ленты.
+        unique = {self._value(row, self._fields[-1]): row for row in rows}
+        return sorted(
+            unique.values(),
+            key=lambda row: [self._value(row, name) for name in self._fields],
+            reverse=direction != PREVIOUS,
+        )[:limit]
+
+
+def fill_timelines(chunk_size=1000):
+    """Раскладывает ленты по всем подпискам, например после загрузки."""
+    follows = Follow.objects.order_by().values_list('user_id', 'author_id')
+    for user_id, author_id in follows.iterator(chunk_size=chunk_size):
+        add_author(user_id, author_id)
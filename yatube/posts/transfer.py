@@ -0,0 +1,365 @@
+"""
+Перенос данных между окружениями в NDJSON.
+
+Первая строка файла - заголовок, дальше по записи на строку:
+{"model": "posts.post", "fields": {...}}. Модели идут в порядке
+зависимостей, внутри модели - по возрастанию первичного ключа, поэтому
+выгрузку и загрузку можно продолжить с контрольной точки. Файл с
+суффиксом .gz пишется пачками, каждая пачка - отдельный gzip-член.
+"""
+import gzip
+import json
+import os
+import shutil
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import IntegrityError, connection, transaction
+
+from . import excerpts, search, thumbnails
+from .counters import reconcile_posts, reconcile_users
+from .management.utils import batches
+from .models import Comment, Follow, Group, Post
+from .timeline import fill_timelines
+
+FORMAT = 'yatube'
+VERSION = 1
+# Производные поля не переносятся: их пересчитывают после загрузки.
+DERIVED = {
+    'posts.post': (
+        'thumbnail_url', 'thumbnail_width', 'thumbnail_height',
+        'comments_count', 'excerpt', 'text_html',
+    ),
+}
+
+
+class TransferError(Exception):
+    pass
+
+
+def models():
+    """Модели в порядке зависимостей по внешним ключам."""
+    return (Group, get_user_model(), Post, Comment, Follow)
+
+
+def _model(label):
+    for model in models():
+        if model._meta.label_lower == label:
+            return model
+    raise TransferError(f'Неизвестная модель {label}')
+
+
+def _fields(model):
+    derived = DERIVED.get(model._meta.label_lower, ())
+    return [
+        field for field in model._meta.concrete_fields
+        if field.name not in derived
+    ]
+
+
+def _default(value):
+    # DjangoJSONEncoder обрезает микросекунды, а с ними ломается порядок
+    # постов, опубликованных в одну секунду.
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def is_compressed(path):
+    return path.endswith('.gz')
+
+
+def open_input(path):
+    if is_compressed(path):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def read_checkpoint(path):
+    try:
+        with open(path, encoding='utf-8') as source:
+            return json.load(source)
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(path, state):
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as output:
+        json.dump(state, output)
+    os.replace(temporary, path)
+
+
+def copy_image(source, target, name):
+    """
+    Копирует файл картинки поста между хранилищем и каталогом выгрузки.
+
+    Возвращает False, если исходного файла нет.
+    """
+    if target.exists(name):
+        return True
+    if not source.exists(name):
+        return False
+    with source.open(name) as content:
+        target.save(name, File(content))
+    return True
+
+
+class DirectoryStorage:
+    """Каталог с картинками выгрузки, с тем же интерфейсом, что storage."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def exists(self, name):
+        return os.path.exists(self.path(name))
+
+    def open(self, name):
+        return open(self.path(name), 'rb')
+
+    def save(self, name, content):
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as output:
+            shutil.copyfileobj(content, output)
+
+
+class Writer:
+    """
+    Дописывает пачки строк в файл выгрузки.
+
+    write() возвращает смещение конца пачки: с него выгрузка продолжается
+    после обрыва, недописанный хвост обрезается.
+    """
+
+    def __init__(self, path, offset=0):
+        self.compressed = is_compressed(path)
+        self.output = open(path, 'r+b' if offset else 'wb')
+        self.output.seek(offset)
+        self.output.truncate()
+
+    def write(self, lines):
+        data = ''.join(lines).encode('utf-8')
+        if self.compressed:
+            with gzip.GzipFile(fileobj=self.output, mode='wb') as member:
+                member.write(data)
+        else:
+            self.output.write(data)
+        self.output.flush()
+        return self.output.tell()
+
+    def close(self):
+        self.output.close()
+
+
+def export(path, chunk_size=2000, state=None, media=None, on_chunk=None):
+    """
+    Выгружает данные пачками по первичному ключу.
+
+    state - контрольная точка прошлого запуска: модель, последний
+    выгруженный ключ и смещение в файле. on_chunk(state) вызывается после
+    каждой записанной пачки. Возвращает число записей по моделям и число
+    картинок, которых не нашлось в хранилище.
+    """
+    labels = [model._meta.label_lower for model in models()]
+    writer = Writer(path, state['offset'] if state else 0)
+    counts = dict.fromkeys(labels, 0)
+    missing = 0
+    try:
+        if state is None:
+            header = {'format': FORMAT, 'version': VERSION, 'models': labels}
+            state = {
+                'model': labels[0],
+                'last_pk': None,
+                'offset': writer.write([json.dumps(header) + '\n']),
+            }
+        for model in models()[labels.index(state['model']):]:
+            label = model._meta.label_lower
+            names = [field.attname for field in _fields(model)]
+            last = state['last_pk'] if state['model'] == label else None
+            while True:
+                rows = model._default_manager.order_by('pk')
+                if last is not None:
+                    rows = rows.filter(pk__gt=last)
+                rows = list(rows.values(*names)[:chunk_size])
+                if not rows:
+                    break
+                if media is not None and model is Post:
+                    missing += sum(
+                        not copy_image(default_storage, media, row['image'])
+                        for row in rows if row['image']
+                    )
+                last = rows[-1][model._meta.pk.attname]
+                offset = writer.write(
+                    json.dumps(
+                        {'model': label, 'fields': row},
+                        ensure_ascii=False,
+                        default=_default,
+                    ) + '\n'
+                    for row in rows
+                )
+                counts[label] += len(rows)
+                state = {'model': label, 'last_pk': last, 'offset': offset}
+                if on_chunk:
+                    on_chunk(state)
+    finally:
+        writer.close()
+    return counts, missing
+
+
+@contextmanager
+def original_dates(model):
+    """Отключает auto_now и auto_now_add, чтобы сохранить даты из файла."""
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+def _records(source, skip):
+    """Записи файла после заголовка с их номерами; первые skip - пропуск."""
+    header = json.loads(source.readline() or 'null')
+    if not isinstance(header, dict) or header.get('format') != FORMAT:
+        raise TransferError('Файл не является выгрузкой Yatube')
+    if header.get('version') != VERSION:
+        raise TransferError(f'Неподдерживаемая версия {header.get("version")}')
+    for number, line in enumerate(source, 1):
+        # Пропущенные строки не разбираются.
+        if number > skip and line.strip():
+            yield number, json.loads(line)
+
+
+def _differs(model, instance, existing):
+    return [
+        field.name for field in _fields(model)
+        if getattr(instance, field.attname) != getattr(existing, field.attname)
+    ]
+
+
+def _save(model, records, media, resume=False):
+    """
+    Сохраняет пачку записей. Возвращает число новых строк и число
+    картинок, которых не нашлось.
+
+    Занятый ключ - TransferError: иначе вместо строки файла молча
+    осталась бы строка базы. При продолжении загрузки совпадающие строки,
+    сохранённые до обрыва, пропускаются.
+    """
+    fields = _fields(model)
+    instances = []
+    for record in records:
+        values = record['fields']
+        instance = model(**{
+            field.attname: field.to_python(values[field.attname])
+            for field in fields if field.attname in values
+        })
+        instances.append((instance, values))
+    existing = model._default_manager.in_bulk(
+        [instance.pk for instance, _ in instances])
+    label = model._meta.label_lower
+    objects = []
+    missing = 0
+    for instance, values in instances:
+        found = existing.get(instance.pk)
+        if found is not None:
+            differs = _differs(model, instance, found)
+            if differs:
+                raise TransferError(
+                    f'{label} {instance.pk} уже есть в базе и отличается: '
+                    f'{", ".join(differs)}')
+            if not resume:
+                raise TransferError(
+                    f'{label} {instance.pk} уже есть в базе; '
+                    'загрузка идёт только в пустую базу')
+            continue
+        if model is Post:
+            excerpts.fill(instance)
+        objects.append(instance)
+        if media is not None and values.get('image'):
+            missing += not copy_image(media, default_storage, values['image'])
+    try:
+        with original_dates(model):
+            model._default_manager.bulk_create(objects)
+    except IntegrityError as error:
+        raise TransferError(f'{label}: конфликт уникальных полей: {error}')
+    return len(objects), missing
+
+
+def load(path, batch_size=1000, skip=0, media=None, on_batch=None,
+         resume=False):
+    """
+    Загружает записи файла пачками bulk_create.
+
+    Сигналы не срабатывают, поэтому счётчики, ленты подписок и поисковый
+    индекс восстанавливает finalize(). on_batch(number) получает номер
+    последней сохранённой записи. Запись с занятым ключом - TransferError;
+    с resume совпадающие с базой записи пропускаются. Возвращает число
+    новых записей по моделям и число картинок, которых не нашлось
+    в каталоге выгрузки.
+    """
+    counts = {}
+    missing = 0
+
+    def flush(label, batch, number):
+        nonlocal missing
+        with transaction.atomic():
+            saved, lost = _save(_model(label), batch, media, resume)
+        missing += lost
+        counts[label] = counts.get(label, 0) + saved
+        if on_batch:
+            on_batch(number)
+
+    batch = []
+    label = None
+    last = skip
+    with open_input(path) as source:
+        for number, record in _records(source, skip):
+            if batch and (
+                    record['model'] != label or len(batch) >= batch_size):
+                flush(label, batch, last)
+                batch = []
+            label = record['model']
+            batch.append(record)
+            last = number
+        if batch:
+            flush(label, batch, last)
+    return counts, missing
+
+
+def finalize(batch_size=1000):
+    """
+    Сбрасывает последовательности ключей и пересчитывает производное.
+
+    Возвращает число постов, для которых созданы миниатюры.
+    """
+    statements = connection.ops.sequence_reset_sql(no_style(), models())
+    if statements:
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+    for ids in batches(get_user_model().objects.all(), batch_size):
+        with transaction.atomic():
+            reconcile_users(ids)
+    for ids in batches(Post.objects.all(), batch_size):
+        with transaction.atomic():
+            reconcile_posts(ids)
+    fill_timelines(batch_size)
+    with transaction.atomic():
+        search.rebuild(search.get_index(), batch_size)
+    return thumbnails.backfill(batch_size=batch_size)
@@ -1,60 +1,121 @@
-from django.core.paginator import Paginator
+from functools import partial
+
+from django.http import Http404, JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
+from django.utils.cache import patch_vary_headers
 from django.contrib.auth.decorators import login_required
-from .models import Post, Group, User, Follow
-from .forms import PostForm, CommentForm
+from core.routers import replica_reads
+from .models import Comment, Post, User, Follow
+from .forms import PostForm, CommentForm, SearchForm
+from .conditional import (
+    conditional_page, group_validators, index_validators, post_validators,
+    profile_validators)
+from .feed_cache import (
+    INDEX_FEED, feed_cache, follow_feed, group_feed, profile_feed)
+from .lookups import get_group_or_404
+from .page_cache import (
+    group_feeds, index_feeds, page_cache, post_feeds, profile_feeds)
+from .paginators import CursorPaginator, FeedPaginator
+from .search import SearchPaginator
+from .timeline import TimelinePaginator, get_feed
 
 
 DISPLAYED_POSTS = 10
+# Комментарии выводятся порциями, страница поста не растёт с обсуждением.
+DISPLAYED_COMMENTS = 20
+
 
+def get_page(request, post_list, feeds=(), total=None,
+             paginator_class=CursorPaginator):
+    """
+    Страница по курсору или, при ?page=, по номеру.
 
-def get_page(request, post_list):
-    paginator = Paginator(post_list, DISPLAYED_POSTS)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+    feeds - ленты, по поколению которых кэшируется число постов, total -
+    заранее известное число, paginator_class - постраничный вывод по
+    курсору.
+    """
+    if 'page' in request.GET:
+        paginator = FeedPaginator(post_list, DISPLAYED_POSTS, feeds, total)
+        return paginator.get_page(request.GET.get('page'))
+    paginator = paginator_class(post_list, DISPLAYED_POSTS)
+    return paginator.get_page(request.GET.get('cursor'))
 
 
+@replica_reads
+@page_cache(index_feeds)
+@conditional_page(index_validators)
 def index(request):
-    post_list = Post.objects.all()
-    page_obj = get_page(request, post_list)
+    post_list = Post.objects.feed()
+    page_obj = get_page(request, post_list, [INDEX_FEED])
     context = {
         'page_obj': page_obj,
+        **feed_cache(INDEX_FEED),
     }
     return render(request, 'posts/index.html', context)
 
 
+@replica_reads
+@page_cache(group_feeds)
+@conditional_page(group_validators)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = get_page(request, post_list)
+    group = get_group_or_404(slug)
+    post_list = group.posts.feed()
+    page_obj = get_page(request, post_list, [group_feed(group.pk)])
     context = {
         'group': group,
         'page_obj': page_obj,
+        **feed_cache(group_feed(group.pk)),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@replica_reads
+@page_cache(profile_feeds)
+@conditional_page(profile_validators)
 def profile(request, username):
-    user = get_object_or_404(User, username=username)
+    user = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username,
+    )
     if request.user.is_authenticated:
         following = Follow.objects.filter(
-            author__following__user=request.user).exists()
+            user=request.user,
+            author=user,
+        ).exists()
     else:
         following = False
-    post_list = user.posts.all()
-    page_obj = get_page(request, post_list)
+    post_list = user.posts.feed()
+    stats = getattr(user, 'stats', None)
+    page_obj = get_page(
+        request,
+        post_list,
+        [profile_feed(user.pk)],
+        stats.posts_count if stats else None,
+    )
     context = {
         'page_obj': page_obj,
         'author': user,
         'following': following,
+        **feed_cache(profile_feed(user.pk)),
     }
     return render(request, 'posts/profile.html', context)
 
 
+def get_comments(post_id, cursor):
+    paginator = CursorPaginator(
+        Comment.objects.thread().filter(post_id=post_id),
+        DISPLAYED_COMMENTS,
+    )
+    return paginator.get_page(cursor)
+
+
+@replica_reads
+@page_cache(post_feeds)
+@conditional_page(post_validators)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(Post.objects.detail(), id=post_id)
     form = CommentForm()
-    comments = post.comments.all()
+    comments = get_comments(post.pk, request.GET.get('comments'))
     context = {
         'post': post,
         'form': form,
@@ -63,6 +124,63 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+@replica_reads
+def post_comments(request, post_id):
+    """Следующая порция комментариев: HTML-фрагмент или JSON."""
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    comments = get_comments(post_id, request.GET.get('cursor'))
+    wants_json = (
+        request.GET.get('format') == 'json'
+        or 'application/json' in request.META.get('HTTP_ACCEPT', '')
+    )
+    if wants_json:
+        response = JsonResponse({
+            'comments': [
+                {
+                    'id': comment.pk,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created.isoformat(),
+                }
+                for comment in comments
+            ],
+            'next_cursor': comments.next_cursor,
+            'previous_cursor': comments.previous_cursor,
+        })
+    else:
+        context = {
+            'post_id': post_id,
+            'comments': comments,
+            'fragment': True,
+        }
+        response = render(
+            request, 'posts/includes/comment_list.html', context)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+@replica_reads
+def search(request):
+    form = SearchForm(request.GET or None)
+    page_obj = None
+    if form.is_valid():
+        group = form.cleaned_data['group']
+        author = form.cleaned_data['author']
+        paginator = SearchPaginator(
+            form.cleaned_data['q'],
+            DISPLAYED_POSTS,
+            group_id=group.pk if group else None,
+            author_id=author.pk if author else None,
+        )
+        page_obj = paginator.get_page(request.GET.get('cursor'))
+    context = {
+        'form': form,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     if request.method == 'POST':
@@ -71,6 +189,7 @@ def post_create(request):
             post = form.save(commit=False)
             post.author = request.user
             post.save()
+            form.schedule_thumbnails()
             return redirect('posts:profile', post.author)
         return render(request, 'posts/create_post.html', {'form': form})
     form = PostForm()
@@ -79,7 +198,17 @@ def post_create(request):
 
 @login_required
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    # Поля, которые пишутся в обход формы, не загружаются, чтобы save()
+    # не затёр их старыми значениями.
+    post = get_object_or_404(
+        Post.objects.defer(
+            'comments_count',
+            'thumbnail_url',
+            'thumbnail_width',
+            'thumbnail_height',
+        ),
+        id=post_id,
+    )
     form = PostForm(
         request.POST or None,
         files=request.FILES or None,
@@ -89,10 +218,11 @@ def post_edit(request, post_id):
         'is_edit': True,
         'form': form,
     }
-    if request.user != post.author:
+    if request.user.pk != post.author_id:
         return redirect('posts:post_detail', post_id=post_id)
     if form.is_valid():
         form.save()
+        form.schedule_thumbnails()
         return redirect('posts:post_detail', post_id=post_id)
 
     return render(request, 'posts/create_post.html', context)
@@ -110,15 +240,16 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@replica_reads
 @login_required
 def follow_index(request):
-    user = request.user
-    followings = Post.objects.filter(
-        author__following__user=user
-    )
-    page_obj = get_page(request, followings)
+    followings = get_feed(request.user)
+    page_obj = get_page(
+        request, followings, [INDEX_FEED, follow_feed(request.user.pk)],
+        paginator_class=partial(TimelinePaginator, user=request.user))
     context = {
         'page_obj': page_obj,
+        **feed_cache(INDEX_FEED, follow_feed(request.user.pk)),
     }
     return render(request, 'posts/follow.html', context)
 
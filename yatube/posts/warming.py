@@ -0,0 +1,121 @@
+"""
+Прогрев кэшей страницами, которые первыми запросят посетители.
+
+Страницы запрашиваются тестовым клиентом анонимно: через middleware и
+те же view, поэтому заполняются кэш готовых страниц, фрагменты лент,
+карточки постов и горячий кэш.
+"""
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from core import prometheus
+
+from .models import Group, Post, User
+from .paginators import CursorPaginator
+from .views import DISPLAYED_POSTS
+
+
+def index_urls(pages):
+    """Первые pages страниц главной с теми же курсорами, что в ссылках."""
+    url = reverse('posts:index')
+    paginator = CursorPaginator(
+        Post.objects.only('pk', 'pub_date'), DISPLAYED_POSTS)
+    urls = []
+    cursor = None
+    while len(urls) < pages:
+        urls.append(f'{url}?{urlencode({"cursor": cursor})}' if cursor
+                    else url)
+        page = paginator.get_page(cursor)
+        if not page.has_next():
+            break
+        cursor = page.next_cursor
+    return urls
+
+
+def group_urls():
+    return [
+        reverse('posts:group_list', kwargs={'slug': slug})
+        for slug in Group.objects.order_by('pk').values_list(
+            'slug', flat=True)
+    ]
+
+
+def profile_urls(authors):
+    """Профили authors авторов с наибольшим числом постов."""
+    usernames = User.objects.filter(
+        stats__posts_count__gt=0
+    ).order_by('-stats__posts_count', 'pk').values_list(
+        'username', flat=True)[:authors]
+    return [
+        reverse('posts:profile', kwargs={'username': username})
+        for username in usernames
+    ]
+
+
+def targets(index_pages, authors):
+    return index_urls(index_pages) + group_urls() + profile_urls(authors)
+
+
+def cache_reads():
+    """Чтения кэша по префиксам ключей из счётчиков процесса."""
+    reads = defaultdict(lambda: [0, 0])
+    for name, labels, value in prometheus.registry.snapshot()['counters']:
+        if name == 'yatube_cache_requests_total':
+            labels = dict(labels)
+            reads[labels['prefix']][labels['result'] == 'miss'] += value
+    return reads
+
+
+def warm(urls, workers=4, budget=30.0):
+    """
+    Запрашивает urls в workers потоках, пока не истекут budget секунд.
+
+    Страницы, до которых не дошла очередь, пропускаются. Возвращает
+    отчёт: число запрошенных и пропущенных страниц, коды ответов, исходы
+    кэша готовых страниц и чтения кэша по префиксам за прогон (если
+    включены метрики).
+    """
+    deadline = time.monotonic() + budget
+    local = threading.local()
+    host = (settings.ALLOWED_HOSTS or ['localhost'])[0]
+
+    def fetch(url):
+        if time.monotonic() > deadline:
+            return None
+        # Тестовый клиент не потокобезопасен: у каждого потока свой.
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = Client(HTTP_HOST=host)
+        try:
+            response = client.get(url)
+            return response.status_code, response.get('X-Page-Cache')
+        finally:
+            connection.close()
+
+    before = cache_reads()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(fetch, urls))
+    elapsed = time.perf_counter() - started
+    after = cache_reads()
+    done = [result for result in results if result is not None]
+    return {
+        'requested': len(done),
+        'skipped': len(results) - len(done),
+        'seconds': elapsed,
+        'statuses': Counter(status for status, _ in done),
+        'pages': Counter(outcome or 'none' for _, outcome in done),
+        'cache': {
+            prefix: (hits - before[prefix][0], misses - before[prefix][1])
+            for prefix, (hits, misses) in sorted(after.items())
+            if (hits, misses) != tuple(before[prefix])
+        },
+    }
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -42,6 +44,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -53,11 +56,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
@@ -93,7 +98,38 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение переиспользуется запросами воркера, пока не истечёт
+        # срок; PRAGMA выполняются один раз на соединение.
+        'CONN_MAX_AGE': int(os.getenv('YATUBE_DB_CONN_MAX_AGE', '600')),
+    }
+}
+
+# Реплики только для чтения: YATUBE_DB_REPLICAS - имена файлов через
+# запятую. Локально их заполняет команда sync_replicas копией primary.
+DATABASE_REPLICAS = []
+for number, name in enumerate(
+        filter(None, os.getenv('YATUBE_DB_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': os.path.join(BASE_DIR, name),
+        'TEST': {'MIRROR': 'default'},
     }
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+# Сколько секунд после записи чтения пользователя идут на primary.
+REPLICA_PIN_SECONDS = int(os.getenv('YATUBE_DB_PIN_SECONDS', '5'))
+
+# PRAGMA для каждого нового соединения с SQLite (core/db.py). В режиме
+# WAL читатели не ждут писателя, а писатели ждут друг друга до
+# busy_timeout миллисекунд вместо немедленной ошибки database is locked.
+# Отрицательный cache_size - размер в КиБ.
+SQLITE_PRAGMAS = {
+    'journal_mode': os.getenv('YATUBE_SQLITE_JOURNAL_MODE', 'wal'),
+    'synchronous': os.getenv('YATUBE_SQLITE_SYNCHRONOUS', 'normal'),
+    'busy_timeout': os.getenv('YATUBE_SQLITE_BUSY_TIMEOUT', '5000'),
+    'cache_size': os.getenv('YATUBE_SQLITE_CACHE_SIZE', '-20000'),
+    'mmap_size': os.getenv('YATUBE_SQLITE_MMAP_SIZE', '134217728'),
+    'temp_store': os.getenv('YATUBE_SQLITE_TEMP_STORE', 'memory'),
 }
 
 
@@ -148,12 +184,145 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Общий кэш выбирается переменной окружения YATUBE_CACHE: locmem годится
+# только для одного процесса, остальные общие для всех воркеров. Для db
+# таблицу создаёт createcachetable, redis работает через redis-py.
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', ''),
+    'file': (
+        'django.core.cache.backends.filebased.FileBasedCache',
+        os.path.join(BASE_DIR, 'cache'),
+    ),
+    'db': ('django.core.cache.backends.db.DatabaseCache', 'yatube_cache'),
+    'redis': ('core.cache.RedisCache', 'redis://127.0.0.1:6379/1'),
+}
+CACHE_NAME = os.getenv('YATUBE_CACHE', 'locmem')
+if CACHE_NAME not in CACHE_BACKENDS:
+    raise ImproperlyConfigured(
+        f'YATUBE_CACHE={CACHE_NAME!r}: допустимые значения '
+        f'{", ".join(CACHE_BACKENDS)}'
+    )
+CACHE_BACKEND, CACHE_LOCATION = CACHE_BACKENDS[CACHE_NAME]
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv('YATUBE_CACHE_LOCATION', CACHE_LOCATION),
+    },
+    # Часто читаемые объекты (группы, авторы): копия в памяти процесса
+    # поверх общего кэша.
+    'hot': {
+        'BACKEND': 'core.cache.TwoTierCache',
+        'LOCATION': 'default',
+        'KEY_PREFIX': 'hot',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 5,
+        },
+    },
 }
 
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+
+# Авторы с таким числом подписчиков и больше не раскладывают посты по лентам
+# при публикации: их посты добавляются в ленту подписок при чтении.
+TIMELINE_CELEBRITY_FOLLOWERS = 1000
+TIMELINE_BATCH_SIZE = 500
+# Когда автор перестаёт быть популярным, его посты раскладываются по
+# лентам подписчиков в фоновых потоках; при 0 - после фиксации транзакции
+# в том же запросе.
+TIMELINE_WORKERS = 1
+
+# Входит в ETag страниц: смена версии при выкладке сбрасывает валидаторы,
+# сохранённые браузерами для старых шаблонов.
+PAGE_VERSION = os.getenv('YATUBE_RELEASE', '1')
+
+# Фрагменты лент сбрасываются сменой поколения при изменении постов,
+# поэтому срок хранения может быть долгим.
+FEED_CACHE_TIMEOUT = 60 * 60
+# Карточки постов в кэше ключуются версией поста, поэтому устаревшая
+# карточка просто перестаёт читаться.
+POST_CARD_TIMEOUT = 60 * 60 * 24
+# Постраничный вывод по номерам (posts.paginators.FeedPaginator): число
+# постов ленты длиннее PAGINATOR_EXACT_COUNT пересчитывается не чаще раза
+# в PAGINATOR_COUNT_TIMEOUT секунд; ссылки на PAGINATOR_WINDOW страниц
+# по обе стороны от текущей.
+PAGINATOR_EXACT_COUNT = 10000
+PAGINATOR_COUNT_TIMEOUT = 10 * 60
+PAGINATOR_WINDOW = 2
+# Длина начала текста поста в лентах, в символах.
+POST_EXCERPT_LENGTH = 300
+
+# Готовые страницы для анонимных посетителей (posts/page_cache.py).
+# Страница свежая PAGE_CACHE_TIMEOUT секунд, после этого ещё
+# PAGE_CACHE_STALE секунд отдаётся, пока её пересобирает один запрос.
+PAGE_CACHE_ENABLED = True
+PAGE_CACHE_TIMEOUT = 20
+PAGE_CACHE_STALE = 5 * 60
+PAGE_CACHE_LOCK_TIMEOUT = 10
+PAGE_CACHE_LOCK_WAIT = 2
+
+# Миниатюры картинок постов создаются при сохранении формы в фоновых
+# потоках; при POST_THUMBNAIL_WORKERS = 0 - сразу, в том же запросе.
+POST_THUMBNAIL_SIZE = '400x400'
+POST_THUMBNAIL_EXTRA_SIZES = []
+POST_THUMBNAIL_WORKERS = 2
+
+# Метрики запросов: заголовок Server-Timing в каждом ответе и строка лога
+# yatube.requests для случайной доли запросов.
+REQUEST_METRICS_HEADER = True
+REQUEST_METRICS_SAMPLE_RATE = float(
+    os.getenv('YATUBE_METRICS_SAMPLE_RATE', '0.01'))
+
+# Метрики Prometheus на /metrics. Воркеры gunicorn сбрасывают свои
+# значения в файлы каталога METRICS_DIR, экспорт их суммирует; без
+# каталога видны только метрики отвечающего процесса.
+METRICS_ENABLED = True
+METRICS_DIR = os.getenv('YATUBE_METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = 1
+# Адреса, которым доступен /metrics; при пустом списке - никому.
+METRICS_ALLOWED_IPS = [
+    ip for ip in os.getenv(
+        'YATUBE_METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',') if ip
+]
+
+# Прогрев процесса при загрузке WSGI-приложения (yatube/wsgi.py).
+WARMUP_ON_BOOT = os.getenv('YATUBE_WARMUP', '1') == '1'
+# Прогрев кэшей страницами (posts/warming.py): при загрузке, если
+# YATUBE_WARM_CACHE=1, и командой warm_cache. Локальный кэш процесса
+# прогревается только при загрузке: с gunicorn --preload воркеры наследуют
+# его от мастера.
+WARM_CACHE_ON_BOOT = os.getenv('YATUBE_WARM_CACHE', '0') == '1'
+WARM_CACHE_INDEX_PAGES = 5
+WARM_CACHE_AUTHORS = 20
+WARM_CACHE_WORKERS = 4
+WARM_CACHE_BUDGET = 10
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'yatube.requests': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'yatube.warmup': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
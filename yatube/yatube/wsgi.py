@@ -3,6 +3,10 @@ WSGI config for yatube project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
 
+After the application is created the process is warmed up (see
+core.warmup). With ``gunicorn --preload`` this happens once in the master
+and forked workers inherit the warmed state.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/2.2/howto/deployment/wsgi/
 """
@@ -14,3 +18,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.WARMUP_ON_BOOT:
+    from core import warmup  # noqa: E402
+
+    warmup.run()